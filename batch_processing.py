@@ -0,0 +1,164 @@
+import os
+import sys
+import types
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import contextmanager
+from io import BytesIO
+
+import pandas as pd
+
+from exports import pctcov_columns
+from transect_processing import process_sheets
+from workbook_loader import load_workbook_sheets
+
+
+def process_workbook(source, zone_method="flags"):
+    """Parse one workbook and compute its percent cover table.
+
+    `source` is a path or the raw bytes of an .xlsx file. Runs fine in a
+    worker process: nothing here touches Streamlit.
+    """
+    sheets, _ = load_workbook_sheets(source)
+    return process_sheets(
+        sheets["PositionalCharacteristics"], sheets["Transects"], sheets["ReadMe"],
+        zone_method, sheets.get("Zones"),
+    )
+
+
+def _process_indexed(index, name, source, zone_method):
+    # Worker entry point: report errors instead of raising so one bad file
+    # doesn't take the rest of the batch down with it
+    try:
+        return index, name, process_workbook(source, zone_method), None
+    except Exception as exc:
+        return index, name, None, f"{type(exc).__name__}: {exc}"
+
+
+def expand_uploads(files):
+    """Turn (name, bytes) pairs into the workbooks to process.
+
+    .zip archives are opened and every .xlsx inside them is returned as
+    "archive.zip/member.xlsx". Excel lock files and macOS metadata are skipped.
+    Returns (workbooks, errors): an archive that can't be read is reported
+    in errors as (name, message), like a failing workbook, and the rest of
+    the uploads are still returned.
+    """
+    workbooks = []
+    errors = []
+    for name, data in files:
+        if name.lower().endswith(".zip"):
+            try:
+                with zipfile.ZipFile(BytesIO(data)) as archive:
+                    members = []
+                    for member in archive.namelist():
+                        base = os.path.basename(member)
+                        if not member.lower().endswith(".xlsx") or base.startswith(("~$", "._")) or member.startswith("__MACOSX/"):
+                            continue
+                        members.append((f"{name}/{member}", archive.read(member)))
+            # Not a zip or truncated, or a member that is encrypted or uses
+            # an unsupported compression method
+            except (zipfile.BadZipFile, OSError, EOFError, RuntimeError, NotImplementedError) as exc:
+                errors.append((name, f"{type(exc).__name__}: {exc}"))
+                continue
+            workbooks.extend(members)
+        else:
+            workbooks.append((name, data))
+    return workbooks, errors
+
+
+@contextmanager
+def _hidden_main_module():
+    """Start worker processes against an empty __main__ module.
+
+    Spawned workers re-import the parent's __main__ script before running
+    anything. Under Streamlit that is the app, so each worker would import
+    Streamlit and run the whole page script. The workers only need this
+    module, which they import by name.
+    """
+    main_module = sys.modules.get("__main__")
+    placeholder = types.ModuleType("__main__")
+    sys.modules["__main__"] = placeholder
+    try:
+        yield
+    finally:
+        # Leave it alone if another script run installed its own meanwhile
+        if sys.modules.get("__main__") is placeholder:
+            sys.modules["__main__"] = main_module
+
+
+def _iter_indexed(workbooks, max_workers=None, mp_context=None, zone_method="flags"):
+    if len(workbooks) <= 1 or max_workers == 1:
+        for index, (name, source) in enumerate(workbooks):
+            yield _process_indexed(index, name, source, zone_method)
+        return
+
+    max_workers = min(max_workers or os.cpu_count() or 1, len(workbooks))
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=mp_context) as pool:
+        # Workers are started as jobs are submitted, so that is when __main__
+        # has to be hidden
+        with _hidden_main_module():
+            futures = {
+                pool.submit(_process_indexed, index, name, source, zone_method): (index, name)
+                for index, (name, source) in enumerate(workbooks)
+            }
+        for future in as_completed(futures):
+            try:
+                yield future.result()
+            except Exception as exc:
+                # e.g. a worker died; still report it against the file
+                index, name = futures[future]
+                yield index, name, None, f"{type(exc).__name__}: {exc}"
+
+
+def iter_batch(workbooks, max_workers=None, mp_context=None, zone_method="flags"):
+    """Process (name, source) pairs across a process pool.
+
+    Yields (name, calculations_df, error) as each workbook finishes, so
+    callers can stream results; exactly one of calculations_df/error is None.
+    A single workbook (or max_workers=1) is processed inline without a pool.
+    """
+    for _, name, calculations_df, error in _iter_indexed(workbooks, max_workers, mp_context, zone_method):
+        yield name, calculations_df, error
+
+
+def combine_results(frames):
+    """Concatenate per-file calculations_df tables into one.
+
+    pctcov_* columns that a workbook doesn't have (species it didn't record)
+    are 0 for its rows rather than NaN, as long as it defines their zone;
+    cover and length of a zone it doesn't define stay NaN.
+    """
+    columns = list(dict.fromkeys(col for frame in frames for col in frame.columns))
+    zone_by_column = dict(zip(*pctcov_columns(columns)[:2]))
+    aligned = []
+    for frame in frames:
+        missing_cover = [
+            col for col in columns
+            if col.startswith("pctcov_") and col not in frame.columns
+            and f"pctcov_all_{zone_by_column.get(col, 'whole')}" in frame.columns
+        ]
+        frame = frame.reindex(columns=columns)
+        frame[missing_cover] = 0.0
+        aligned.append(frame)
+    frames = aligned
+    if not frames:
+        return pd.DataFrame(columns=columns)
+    return pd.concat(frames, ignore_index=True)
+
+
+def process_batch(workbooks, max_workers=None, mp_context=None, zone_method="flags"):
+    """Process many workbooks in parallel.
+
+    Returns (calculations_df, errors): the combined table in input order and
+    a list of (name, message) for every workbook that failed, also in input order.
+    """
+    results = {}
+    errors = {}
+    for index, name, calculations_df, error in _iter_indexed(workbooks, max_workers, mp_context, zone_method):
+        if error is None:
+            results[index] = calculations_df
+        else:
+            errors[index] = (name, error)
+    frames = [results[index] for index in sorted(results)]
+    return combine_results(frames), [errors[index] for index in sorted(errors)]
@@ -0,0 +1,209 @@
+"""Stage-by-stage benchmark of the percent cover pipeline.
+
+    python -m benchmarks.bench_pipeline                      # the default scenarios
+    python -m benchmarks.bench_pipeline --scenario large --repeat 5 -o after.json
+    python -m benchmarks.bench_pipeline --compare before.json after.json
+
+Run from the repository root. Each scenario writes a synthetic workbook
+(benchmarks.synthetic) and times the stages separately: parse, validate
+(validation.validate_sheets), classify (join positional data and tag
+zones), zones (the exact overlap zones, with a back dune from a Zones
+sheet), aggregate (percent cover), plot (the app's stacked bar chart,
+rendered to PNG by charts.render_png without the app's cache) and export
+(CSV and Parquet).
+The best of --repeat runs is reported along with the peak memory allocated
+during each stage, traced (tracemalloc) in one extra run that isn't timed.
+Reports are JSON so runs can be compared across commits.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.synthetic import write_workbook
+
+
+# (sites, surveys per site, transects per survey, intercepts per transect, species)
+SCENARIOS = {
+    "small": (2, 1, 4, 50, 30),
+    "medium": (5, 4, 6, 150, 60),
+    "large": (20, 4, 8, 300, 90),
+}
+
+STAGES = ("parse", "validate", "classify", "zones", "aggregate", "plot", "export")
+
+
+def _measure(func, repeat):
+    """Best wall time over `repeat` runs, the peak traced memory of one more
+    run (tracing slows it down, so it isn't timed), and the last result."""
+    best = float("inf")
+    for _ in range(max(repeat, 1)):
+        started = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - started)
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return best, peak, result
+
+
+def _plot(calculations_df):
+    from charts import render_png, stack_table
+
+    # One site/date/zone, drawn the way the app draws it (uncached)
+    first = calculations_df.iloc[0]
+    filtered_df = calculations_df[(calculations_df["sitename"] == first["sitename"]) & (calculations_df["date"] == first["date"])]
+    return len(render_png(stack_table(filtered_df, "whole"), f"Species Composition – {first['sitename']}, {first['date']} (Whole)"))
+
+
+def _back_dune(positional_df):
+    """A Zones sheet with a back dune from eastend to toe_in on every
+    transect, given as two overlapping intervals."""
+    import pandas as pd
+
+    keys = positional_df[["sitename", "date", "transect"]]
+    middle = (positional_df["eastend"] + positional_df["toe_in"]) / 2
+    return pd.concat([
+        keys.assign(zone="back dune", zone_start=positional_df["eastend"], zone_end=middle + 1),
+        keys.assign(zone="back dune", zone_start=middle - 1, zone_end=positional_df["toe_in"]),
+    ], ignore_index=True)
+
+
+def run_scenario(name, params, repeat=3, workdir=None):
+    from exports import export_bytes
+    from transect_processing import compute_percent_cover, overlap_zones, prepare_transects, transect_lengths
+    from validation import validate_sheets
+    from workbook_loader import load_workbook_sheets
+
+    sites, surveys, transects, intercepts, species = params
+    workdir = workdir or tempfile.mkdtemp(prefix="transect-bench-")
+    path = os.path.join(workdir, f"{name}.xlsx")
+    rows = write_workbook(path, sites, surveys, transects, intercepts, species)
+
+    timings = {}
+    load_workbook_sheets(path)  # warm up imports and the OS file cache
+    timings["parse"] = _measure(lambda: load_workbook_sheets(path), repeat)
+    sheets, _ = timings["parse"][2]
+    zones_sheet = _back_dune(sheets["PositionalCharacteristics"])
+    timings["validate"] = _measure(
+        lambda: validate_sheets(sheets["PositionalCharacteristics"], sheets["Transects"], sheets["ReadMe"], zones_sheet),
+        repeat,
+    )
+    timings["classify"] = _measure(
+        lambda: prepare_transects(sheets["PositionalCharacteristics"], sheets["Transects"], sheets["ReadMe"]), repeat
+    )
+    positional_df, transects_df = timings["classify"][2]
+    timings["zones"] = _measure(
+        lambda: overlap_zones(transects_df, positional_df, transect_lengths(positional_df), zones_sheet), repeat
+    )
+    timings["aggregate"] = _measure(
+        lambda: compute_percent_cover(transects_df, transect_lengths(positional_df)), repeat
+    )
+    calculations_df = timings["aggregate"][2]
+    _plot(calculations_df)  # warm matplotlib
+    timings["plot"] = _measure(lambda: _plot(calculations_df), repeat)
+    timings["export"] = _measure(
+        lambda: (len(export_bytes(calculations_df, "csv")), len(export_bytes(calculations_df, "parquet"))), repeat
+    )
+
+    return {
+        "scenario": name,
+        "sites": sites, "surveys": surveys, "transects": transects, "intercepts": intercepts, "species": species,
+        "intercept_rows": rows,
+        "workbook_bytes": os.path.getsize(path),
+        "output_shape": list(calculations_df.shape),
+        "stages": {stage: {"seconds": round(timings[stage][0], 6), "peak_mb": round(timings[stage][1] / 2**20, 3)} for stage in STAGES},
+        "total_seconds": round(sum(timings[stage][0] for stage in STAGES), 6),
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment():
+    import numpy
+    import openpyxl
+    import pandas
+    return {
+        "commit": _git_commit(),
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "pandas": pandas.__version__,
+        "numpy": numpy.__version__,
+        "openpyxl": openpyxl.__version__,
+    }
+
+
+def print_report(report, file=sys.stdout):
+    env = report["environment"]
+    print(f"commit {env['commit']}  python {env['python']}  pandas {env['pandas']}", file=file)
+    print(f"{'scenario':<10}{'rows':>9}" + "".join(f"{stage:>16}" for stage in STAGES) + f"{'total':>10}", file=file)
+    for result in report["results"]:
+        cells = "".join(
+            f"{result['stages'][stage]['seconds']:>8.3f}s{result['stages'][stage]['peak_mb']:>6.1f}MB" for stage in STAGES
+        )
+        print(f"{result['scenario']:<10}{result['intercept_rows']:>9}{cells}{result['total_seconds']:>9.3f}s", file=file)
+
+
+def compare(before, after, file=sys.stdout):
+    """Print the per-stage change in time between two reports."""
+    print(f"before {before['environment']['commit']} -> after {after['environment']['commit']}", file=file)
+    print(f"{'scenario':<10}" + "".join(f"{stage:>18}" for stage in STAGES + ('total',)), file=file)
+    previous = {result["scenario"]: result for result in before["results"]}
+    for result in after["results"]:
+        old = previous.get(result["scenario"])
+        if old is None or old["intercept_rows"] != result["intercept_rows"]:
+            continue
+        cells = ""
+        for stage in STAGES + ("total",):
+            if stage != "total" and stage not in old["stages"]:
+                # A report from before this stage was benchmarked
+                cells += f"{'-':>18}"
+                continue
+            new_s = result["total_seconds"] if stage == "total" else result["stages"][stage]["seconds"]
+            old_s = old["total_seconds"] if stage == "total" else old["stages"][stage]["seconds"]
+            change = (new_s - old_s) / old_s * 100 if old_s else 0.0
+            cells += f"{new_s:>9.3f}s ({change:+4.0f}%)"
+        print(f"{result['scenario']:<10}{cells}", file=file)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the transect processing pipeline stage by stage.")
+    parser.add_argument("--scenario", action="append", choices=list(SCENARIOS), help="scenario(s) to run (default: small and medium)")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per stage; the best time is reported")
+    parser.add_argument("-o", "--output", help="write the JSON report here")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"), help="compare two saved reports instead of running")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        with open(args.compare[0]) as before, open(args.compare[1]) as after:
+            compare(json.load(before), json.load(after))
+        return 0
+
+    report = {"environment": environment(), "results": []}
+    with tempfile.TemporaryDirectory(prefix="transect-bench-") as workdir:
+        for name in args.scenario or ["small", "medium"]:
+            report["results"].append(run_scenario(name, SCENARIOS[name], args.repeat, workdir))
+    print_report(report)
+    if args.output:
+        with open(args.output, "w") as handle:
+            json.dump(report, handle, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,139 @@
+"""Synthetic survey workbooks in the dune_data_blank.xlsx schema.
+
+    python -m benchmarks.synthetic out.xlsx --sites 5 --surveys 4 --transects 6 --intercepts 200
+
+Species codes, codetypes and native status come from the template's ReadMe,
+so every generated type maps the way real data does (plus a few "-D" dead
+plant codes). The sheet order and headers follow the template: ReadMe,
+Metadata, Transects, Elevation, PositionalCharacteristics, SpeciesChecker.
+"""
+import argparse
+import datetime
+
+import numpy as np
+import openpyxl
+
+from workbook_loader import load_workbook_sheets
+
+
+TEMPLATE_PATH = "dune_data_blank.xlsx"
+
+TRANSECTS_HEADER = ["sitename", "date", "transect", "start", "end", "type", "depth", "pct_cover", "total_length", "cor_length"]
+POSITIONAL_HEADER = ["sitename", "date", "transect", "eastend", "inlandend", "toe_in", "crest", "toe_sea", "lowest_veg", "HTS", "WTO"]
+ELEVATION_HEADER = ["sitename", "date", "transect", "tran_dist", "tran_ht"]
+METADATA_HEADER = ["Site", "Date", "Weather", "start time", "end time", "tide", "Investigators", "notes"]
+
+
+def template_readme(template_path=TEMPLATE_PATH):
+    """The template's ReadMe rows as (codetype, name, description, native) tuples."""
+    sheets, _ = load_workbook_sheets(template_path, {"ReadMe": ["codetype", "name", "description", "native"]})
+    readme = sheets["ReadMe"]
+    return [tuple(None if v != v else v for v in row) for row in readme.itertuples(index=False, name=None)]
+
+
+def transect_letters(n):
+    letters = []
+    for i in range(n):
+        name = ""
+        i += 1
+        while i:
+            i, rem = divmod(i - 1, 26)
+            name = chr(65 + rem) + name
+        letters.append(name)
+    return letters
+
+
+def generate_tables(sites=3, surveys=2, transects=5, intercepts=100, species=40, seed=0, readme=None):
+    """Row lists for the Transects, PositionalCharacteristics and Elevation sheets.
+
+    Each transect runs from eastend=0 to a random HTS with the foredune toes
+    and lowest_veg placed in order along it; intercepts are laid end to end
+    with gaps, so some straddle the zone boundaries.
+    """
+    rng = np.random.default_rng(seed)
+    readme = readme if readme is not None else template_readme()
+    codes = [name for codetype, name, _, _ in readme if codetype not in (None, "Column Header") and name and name != "-D"]
+    plants = [name for codetype, name, _, _ in readme if codetype == "Terrestrial Plant"]
+    chosen = list(rng.choice(codes, size=min(species, len(codes)), replace=False))
+    chosen += [f"{name}-D" for name in rng.choice(plants, size=max(1, species // 10), replace=False)]
+
+    transect_rows = []
+    positional_rows = []
+    elevation_rows = []
+    first_date = datetime.datetime(2024, 1, 15)
+    for s in range(sites):
+        sitename = f"Site{s + 1:03d}"
+        for d in range(surveys):
+            date = first_date + datetime.timedelta(days=91 * d)
+            for letter in transect_letters(transects):
+                hts = float(rng.uniform(40, 120))
+                toe_in = float(rng.uniform(0.05, 0.3) * hts)
+                crest = toe_in + float(rng.uniform(2, 10))
+                toe_sea = crest + float(rng.uniform(2, 15))
+                lowest_veg = float(rng.uniform(toe_sea, hts))
+                positional_rows.append([sitename, date, letter, 0.0, 0.0, toe_in, crest, toe_sea, lowest_veg, hts, hts + float(rng.uniform(1, 5))])
+
+                for dist in np.linspace(0, hts, 12):
+                    elevation_rows.append([sitename, date, letter, float(dist), float(rng.uniform(0, 6))])
+
+                # Intercepts end to end along the transect, with gaps
+                lengths = rng.uniform(0.05, 2.0, intercepts)
+                gaps = rng.uniform(0, 1.0, intercepts)
+                starts = np.cumsum(gaps + lengths) - lengths
+                starts *= hts / max(starts[-1] + lengths[-1], hts) if intercepts else 1
+                types = rng.choice(chosen, size=intercepts)
+                pct_cover = rng.integers(5, 101, intercepts)
+                for start, length, code, pct in zip(starts, lengths, types, pct_cover):
+                    end = float(start + length)
+                    transect_rows.append([
+                        sitename, date, letter, float(start), end, str(code), float(rng.uniform(1, 80)),
+                        int(pct), float(length), float(length * pct / 100),
+                    ])
+    return transect_rows, positional_rows, elevation_rows
+
+
+def write_workbook(path, sites=3, surveys=2, transects=5, intercepts=100, species=40, seed=0, template_path=TEMPLATE_PATH):
+    """Write a synthetic workbook and return the number of intercept rows."""
+    readme = template_readme(template_path)
+    transect_rows, positional_rows, elevation_rows = generate_tables(sites, surveys, transects, intercepts, species, seed, readme)
+
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet("ReadMe")
+    sheet.append(["codetype", "name", "description", "native"])
+    for row in readme:
+        sheet.append(list(row))
+    sheet = workbook.create_sheet("Metadata")
+    sheet.append(METADATA_HEADER)
+    for s in sorted({(row[0], row[1]) for row in positional_rows}):
+        sheet.append([s[0], s[1], "clear", None, None, None, "synthetic", None])
+    for name, header, rows in (
+        ("Transects", TRANSECTS_HEADER, transect_rows),
+        ("Elevation", ELEVATION_HEADER, elevation_rows),
+        ("PositionalCharacteristics", POSITIONAL_HEADER, positional_rows),
+    ):
+        sheet = workbook.create_sheet(name)
+        sheet.append(header)
+        for row in rows:
+            sheet.append(row)
+    sheet = workbook.create_sheet("SpeciesChecker")
+    sheet.append(["all codes", "correct?", "sitewide species codes", "correct?"])
+    workbook.save(path)
+    return len(transect_rows)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write a synthetic dune survey workbook.")
+    parser.add_argument("output")
+    parser.add_argument("--sites", type=int, default=3)
+    parser.add_argument("--surveys", type=int, default=2, help="survey dates per site")
+    parser.add_argument("--transects", type=int, default=5, help="transects per survey")
+    parser.add_argument("--intercepts", type=int, default=100, help="intercepts per transect")
+    parser.add_argument("--species", type=int, default=40)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    rows = write_workbook(args.output, args.sites, args.surveys, args.transects, args.intercepts, args.species, args.seed)
+    print(f"Wrote {args.output} ({rows} intercepts)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+from io import BytesIO
+
+import pandas as pd
+
+
+def stack_table(filtered_df, zone):
+    """The pctcov columns of one zone for the selected transects, indexed by
+    transect and named by category, without the categories that are zero on
+    every transect."""
+    # The zone is everything after the last underscore (see zones.zone_names)
+    zone_cols = [col for col in filtered_df.columns if col.startswith("pctcov_") and col.rpartition("_")[2] == zone]
+    stack_df = filtered_df[["transect"] + zone_cols].copy()
+    stack_df.columns = ["transect"] + [col[len("pctcov_"):].rpartition("_")[0] for col in zone_cols]
+
+    # Remove species columns with all zero percent cover
+    nonzero_cols = [col for col in stack_df.columns[1:] if stack_df[col].sum() > 0]
+    return stack_df[["transect"] + nonzero_cols].set_index("transect")
+
+
+def pastel_colors(n):
+    from matplotlib import colormaps
+    base_cmap = colormaps["Pastel1" if n <= 9 else "Pastel2"]  # Pastel1: 9 colors, Pastel2: 8
+    if n > base_cmap.N:
+        return [base_cmap(i / n) for i in range(n)]
+    else:
+        return [base_cmap(i) for i in range(n)]
+
+
+def render_png(stack_df, title, dpi=200):
+    """Draw the stacked bar chart of a stack_table and return it as PNG bytes.
+
+    The figure is built without pyplot, so it is never registered with
+    pyplot's figure manager and is freed as soon as the PNG is written.
+    """
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=(10, 6))
+    ax = fig.subplots()
+    stack_df.plot(kind="barh", stacked=True, ax=ax, color=pastel_colors(len(stack_df.columns)))
+    ax.set_title(title)
+    ax.set_xlabel("Percent Cover")
+    ax.set_ylabel("Transect")
+    fig.tight_layout()
+    buffer = BytesIO()
+    fig.savefig(buffer, format="png", dpi=dpi, bbox_inches="tight")
+    fig.clear()
+    return buffer.getvalue()
+
+
+def chart_data(filtered_df, zones):
+    """Every zone's stack_table for the selected transects as one long table
+    of (zone, transect, category, pctcov), zero cover left out."""
+    frames = []
+    for zone in zones:
+        stack_df = stack_table(filtered_df, zone)
+        long_df = stack_df.reset_index().melt("transect", var_name="category", value_name="pctcov")
+        long_df.insert(0, "zone", zone)
+        frames.append(long_df[long_df["pctcov"] > 0])
+    if not frames:
+        return pd.DataFrame(columns=["zone", "transect", "category", "pctcov"])
+    return pd.concat(frames, ignore_index=True)
+
+
+def vega_lite_spec(zones, title, n_categories):
+    """Vega-Lite spec for a chart_data table: the stacked bars of one zone,
+    with a radio button bound to a parameter so the browser switches zones
+    without asking the server."""
+    return {
+        "title": title,
+        "params": [{
+            "name": "zone",
+            "value": zones[0],
+            "bind": {"input": "radio", "options": list(zones), "name": "Zone "},
+        }],
+        "transform": [{"filter": "datum.zone == zone"}],
+        "mark": "bar",
+        "height": {"step": 24},
+        "encoding": {
+            "y": {"field": "transect", "type": "nominal", "title": "Transect"},
+            "x": {"field": "pctcov", "type": "quantitative", "stack": "zero", "title": "Percent Cover"},
+            "color": {
+                "field": "category", "type": "nominal", "title": None,
+                "scale": {"scheme": "pastel1" if n_categories <= 9 else "pastel2"},
+            },
+            "tooltip": [
+                {"field": "transect", "type": "nominal"},
+                {"field": "category", "type": "nominal"},
+                {"field": "pctcov", "type": "quantitative", "format": ".1%"},
+            ],
+        },
+    }
+
+
+def trend_spec(title):
+    """Vega-Lite spec for cover_stats rows of one zone and category: mean
+    cover over time per site, with its confidence interval as a band."""
+    color = {"field": "sitename", "type": "nominal", "title": "Site"}
+    return {
+        "title": title,
+        "encoding": {"x": {"field": "date", "type": "temporal", "title": "Survey date"}},
+        "layer": [
+            {
+                "mark": {"type": "errorband", "opacity": 0.25},
+                "encoding": {
+                    "y": {"field": "ci_low", "type": "quantitative", "title": "Mean percent cover"},
+                    "y2": {"field": "ci_high"},
+                    "color": color,
+                },
+            },
+            {
+                "mark": {"type": "line", "point": True},
+                "encoding": {
+                    "y": {"field": "mean", "type": "quantitative"},
+                    "color": color,
+                    "tooltip": [
+                        {"field": "sitename", "type": "nominal"},
+                        {"field": "date", "type": "temporal"},
+                        {"field": "mean", "type": "quantitative", "format": ".3f"},
+                        {"field": "sd", "type": "quantitative", "format": ".3f"},
+                        {"field": "ci_low", "type": "quantitative", "format": ".3f"},
+                        {"field": "ci_high", "type": "quantitative", "format": ".3f"},
+                        {"field": "n_transects", "type": "quantitative"},
+                    ],
+                },
+            },
+        ],
+    }
@@ -1,11 +1,18 @@
 import streamlit as st
 import pandas as pd
-import matplotlib.pyplot as plt
-import openpyxl
-import copy
-from io import BytesIO
-from matplotlib import cm
-import numpy as np
+import hashlib
+import multiprocessing
+import os
+import time
+from batch_processing import expand_uploads, process_batch
+from charts import chart_data, render_png, stack_table, trend_spec, vega_lite_spec
+from exports import EXPORT_FORMATS, LAYOUTS, export_bytes, export_file_name
+from instrumentation import StageTimer, profile_call
+from results_store import ResultsStore
+from transect_processing import ZONE_METHODS, process_sheets
+from trends import cover_stats, survey_changes
+from validation import ValidationError
+from workbook_loader import load_workbook_sheets
 
 # Custom CSS for background image
 st.markdown(
@@ -33,316 +40,198 @@ st.markdown("<p style='font-size:18px; color:#FDFD96;'>By Dakota Fee and Maya Be
 st.write("")  # Adds a small space
 
 #FOR THE INTERACTIVE DATA INPUT AND TEMPLATE FILE DOWNLOAD
-# Load the template only once and store it in session state
+# The template is only ever downloaded, never parsed, so its raw bytes are read
+# once per server process and shared by every session
 template_path = "dune_data_blank.xlsx"
 
-if "sheets_dict" not in st.session_state:
-    st.session_state.sheets_dict = pd.read_excel(template_path, sheet_name=None)
-
-sheets_dict = st.session_state.sheets_dict  # Reference from session state
+@st.cache_resource
+def template_bytes():
+    with open(template_path, "rb") as file:
+        return file.read()
 
 # Section: Download Template File
 st.header("Download Template")
-with open(template_path, "rb") as file:
-    st.download_button("Download Template (xlsx)", file, file_name="template.xlsx")
+st.download_button("Download Template (xlsx)", template_bytes(), file_name="template.xlsx")
 
 # Section: Interactive Data Entry
 st.subheader("Or Input Data")
 
+#CACHED PARSE AND COMPUTE
+# Widget changes rerun the whole script, so the parsed sheets and the computed
+# percent cover are cached by the sha256 of the uploaded bytes. Only the last
+# few uploads are kept; older entries are evicted first.
+CACHE_MAX_ENTRIES = 8
+
+# Local results store that processed surveys can be saved to. Off unless
+# TRANSECT_STORE_PATH is set: on a shared instance every visitor would see
+# (and could load) what everyone else saved.
+STORE_PATH = os.environ.get("TRANSECT_STORE_PATH")
+
+def read_upload(file_bytes):
+    # Opens the workbook once and reads only the sheets/columns the pipeline uses
+    timer = StageTimer()
+    with timer.stage("parse") as stage:
+        sheets, parse_timings = load_workbook_sheets(file_bytes)
+        stage["rows"] = sum(len(sheet) for sheet in sheets.values())
+    for sheet, seconds in parse_timings.items():
+        timer.record(f"parse:{sheet}", seconds, len(sheets[sheet]) if sheet in sheets else None)
+    return sheets, timer
+
+def run_pipeline(sheets, zone_method, timer):
+    return process_sheets(
+        sheets["PositionalCharacteristics"], sheets["Transects"], sheets["ReadMe"],
+        zone_method, sheets.get("Zones"), timer,
+    )
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES, show_spinner="Reading workbook...")
+def parse_workbook(digest, _file_bytes):
+    sheets, timer = read_upload(_file_bytes)
+    return sheets, timer.stages, time.time()
+
+# Stage timings are cached with the result, so a cache hit shows the timings
+# of the run that computed it
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES, show_spinner="Calculating percent cover...")
+def compute_workbook(digest, _file_bytes, zone_method):
+    sheets, parse_stages, _ = parse_workbook(digest, _file_bytes)
+    timer = StageTimer()
+    timer.extend(parse_stages)
+    calculations_df = run_pipeline(sheets, zone_method, timer)
+    return calculations_df, timer.stages, time.time()
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES, show_spinner="Processing batch...")
+def compute_batch(digest, _files, zone_method):
+    # Workers are spawned rather than forked so they don't inherit the server's
+    # threads; batch_processing keeps them from re-running this script
+    timer = StageTimer()
+    with timer.stage("batch") as stage:
+        workbooks, upload_errors = expand_uploads(_files)
+        calculations_df, errors = process_batch(workbooks, mp_context=multiprocessing.get_context("spawn"), zone_method=zone_method)
+        stage["rows"] = len(calculations_df)
+    # Unreadable archives count as failed workbooks
+    return calculations_df, upload_errors + errors, len(workbooks) + len(upload_errors), timer.stages, time.time()
+
+# Rendered charts, keyed by the dataset (upload digest + zone method) and the
+# selection. Many selections get revisited, so more entries are kept than for
+# the computed results.
+CHART_CACHE_ENTRIES = 64
+
+@st.cache_data(max_entries=CHART_CACHE_ENTRIES, show_spinner=False)
+def cached_chart_png(digest, zone_method, site, date, zone, _filtered_df):
+    stack_df = stack_table(_filtered_df, zone)
+    if len(stack_df.columns) == 0:
+        return None
+    return render_png(stack_df, f"Species Composition – {site}, {date} ({zone.capitalize()})")
+
+@st.cache_data(max_entries=CHART_CACHE_ENTRIES, show_spinner=False)
+def cached_chart_data(digest, zone_method, site, date, zones, _filtered_df):
+    return chart_data(_filtered_df, zones)
+
+# Survey statistics for the comparison view, cached on the table's contents
+# so the upload and the results store share one cache
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES, show_spinner="Summarizing surveys...")
+def survey_trends(compare_df):
+    stats = cover_stats(compare_df)
+    return stats, survey_changes(stats), cover_stats(compare_df, by=["year"])
+
+def profile_workbook(file_bytes, zone_method):
+    # Uncached, so every stage actually runs under the profiler
+    sheets, timer = read_upload(file_bytes)
+    calculations_df = run_pipeline(sheets, zone_method, timer)
+    return calculations_df, timer.stages
+
 #FOR THE DRAG AND DROP
-# Upload the Excel file
-uploaded_file = st.file_uploader("Upload an Excel file", type=["xlsx"])
-
-if uploaded_file:
-    # Load the data from sheets
-    positional_df = pd.read_excel(uploaded_file, sheet_name="PositionalCharacteristics")
-    transects_df = pd.read_excel(uploaded_file, sheet_name="Transects")
-    elevation_df = pd.read_excel(uploaded_file, sheet_name="Elevation")
-    readme_df = pd.read_excel(uploaded_file, sheet_name="ReadMe")
-    calculations_df = pd.DataFrame()
-    # Strip leading/trailing spaces to ensure clean matching
-    transects_df['type'] = transects_df['type'].str.strip()
-    readme_df['name'] = readme_df['name'].str.strip()
-    
-    #amend the transects column to have more specific data so there are no duplicate values
-    transects_df["transect"] = transects_df["sitename"] + "_" + transects_df["date"].astype(str) + "_" + transects_df["transect"]
-    positional_df["transect"] = positional_df["sitename"] + "_" + positional_df["date"].astype(str) + "_" + positional_df["transect"]
-    
-    # Create a mapping from 'name' to 'native' from readme_df
-    name_to_native = readme_df.set_index('name')['native']
-    
-    # Add 'native' column to transects_df based on 'type' matching 'name'
-    transects_df['native'] = transects_df['type'].map(name_to_native)
-    
-    # Create a mapping from 'name' to 'codetype' in readme_df
-    type_to_codetype = readme_df.set_index('name')['codetype']
-    # Map the 'codetype' values to transects_df based on 'type'
-    transects_df['codetype'] = transects_df['type'].map(type_to_codetype)
-    # Fill missing 'codetype' values with "Dead Terrestrial Plant" if 'type' contains "-D"
-    transects_df.loc[transects_df['type'].str.contains('-D', na=False), 'codetype'] = "Dead Terrestrial Plant"
-    
-    
-    # Create a mapping for positional information (toe_sea, toe_in, lowest_veg)
-    positional_mapping = positional_df.set_index('transect')[['toe_sea', 'toe_in', 'lowest_veg']]
-    
-    # Map the positional values to transects_df
-    transects_df = transects_df.join(positional_mapping, on='transect')
-    
-    # Calculate if the row starts or ends within the dune
-    start_within_dune = (transects_df['start'] <= transects_df['toe_sea']) & (transects_df['start'] >= transects_df['toe_in'])
-    end_within_dune = (transects_df['end'] >= transects_df['toe_in']) & (transects_df['end'] <= transects_df['toe_sea'])
-    
-    # Create the final 'dune' column directly
-    transects_df['dune'] = start_within_dune | end_within_dune
-    
-    
-    # Identify if the row is within the vegetated portion of the dune
-    transects_df['veg'] = transects_df['start'] <= transects_df['lowest_veg']
-    
-    #transects_df.drop(columns=["sitename", "date"], inplace=True)
-    
-    #transect letter
-    calculations_df["transect"] = positional_df["transect"]
-    #transect name and site name
-    calculations_df["sitename"] = positional_df ["sitename"]
-    calculations_df["date"] = positional_df["date"]
-    # transect length
-    calculations_df["tran_length"] = (positional_df["HTS"] - positional_df["eastend"]).abs()
-     # dune length
-    calculations_df["dune_length"] = positional_df["toe_sea"] - positional_df["toe_in"].abs()
-    # vegeted length
-    calculations_df["veg_length"] = (positional_df["lowest_veg"] - positional_df["eastend"]).abs()
-    
-    # -------all cover types------
-    
-    # EVERYTHING OVER ENTIRE TRANSECT
-    calculations_df = calculations_df.merge(
-        transects_df.groupby("transect")["cor_length"].sum().reset_index(),
-        on="transect", how="left"
+# Upload one Excel file, or several (or a zip of them) to process as a batch
+uploaded_files = st.file_uploader(
+    "Upload an Excel file, or several files / a zip for batch processing",
+    type=["xlsx", "zip"],
+    accept_multiple_files=True,
+)
+
+# How intercepts that straddle a zone boundary are counted
+zone_method = st.radio(
+    "Dune / vegetated zone method:",
+    ZONE_METHODS,
+    format_func={"flags": "Endpoint flags (original)", "overlap": "Exact overlap"}.get,
+    horizontal=True,
+    help="Endpoint flags count an intercept's whole length toward the dune if either end is inside it. "
+         "Exact overlap clips each intercept to each zone and only counts the part inside, "
+         "and also reports any extra zones listed in an optional 'Zones' sheet "
+         "(sitename, date, transect, zone, zone_start, zone_end).",
+)
+
+profile_run = st.checkbox(
+    "Profile this run (cProfile)",
+    help="Bypasses the cache and runs the whole pipeline under cProfile. The top functions are shown under "
+         "Diagnostics, with a .prof file to open in snakeviz or turn into a flame graph. Single workbooks only.",
+)
+
+if uploaded_files:
+    # Key the cache on the file contents, not the upload widget
+    files = [(uploaded_file.name, uploaded_file.getvalue()) for uploaded_file in uploaded_files]
+    hasher = hashlib.sha256()
+    for name, file_bytes in files:
+        hasher.update(name.encode())
+        hasher.update(file_bytes)
+    digest = hasher.hexdigest()
+
+    # Compute every percent cover column in one pass (or reuse the cached result).
+    # A result stamped after this run started was computed now, i.e. a cache miss.
+    run_started = time.time()
+    run_timer = StageTimer()  # stages timed on this rerun (plot, export)
+    profile_text = profile_data = None
+    single_workbook = len(files) == 1 and files[0][0].lower().endswith(".xlsx")
+    if single_workbook:
+        # The sheets are validated before anything is aggregated; show every
+        # problem at once so the workbook can be fixed in one go
+        try:
+            if profile_run:
+                with st.spinner("Profiling..."):
+                    (calculations_df, pipeline_stages), profile_text, profile_data = profile_call(profile_workbook, files[0][1], zone_method)
+                computed_at = time.time()
+            else:
+                calculations_df, pipeline_stages, computed_at = compute_workbook(digest, files[0][1], zone_method)
+        except ValidationError as exc:
+            st.error(f"The workbook needs fixing before it can be processed. {exc}")
+            st.dataframe(exc.errors, hide_index=True)
+            st.stop()
+        batch_errors = []
+    else:
+        calculations_df, batch_errors, n_workbooks, pipeline_stages, computed_at = compute_batch(digest, files, zone_method)
+        st.caption(f"Batch: {n_workbooks - len(batch_errors)} of {n_workbooks} workbooks processed")
+    cache_hit = computed_at < run_started
+    st.caption(
+        f"{'✅ Cache hit' if cache_hit else '🔄 Cache miss'} for upload {digest[:12]} "
+        f"({time.time() - run_started:.2f}s)"
     )
-    calculations_df["pctcov_all_whole"] = calculations_df["cor_length"] / calculations_df["tran_length"]
-    calculations_df.drop(columns=["cor_length"], inplace=True)
-    
-    # EVERYTHING OVER DUNE PORTION OF TRANSECT
-    dune_df = transects_df[transects_df["dune"] == True] \
-        .groupby("transect", as_index=False)["cor_length"].sum()
-    
-    calculations_df = calculations_df.merge(dune_df, on="transect", how="left")
-    calculations_df["cor_length"] = calculations_df["cor_length"].fillna(0)  # Fill missing values with 0
-    calculations_df["pctcov_all_dune"] = calculations_df["cor_length"] / calculations_df["dune_length"]
-    calculations_df.drop(columns=["cor_length"], inplace=True)
-    
-    # EVERYTHING OVER VEGETATED PORTION OF TRANSECT
-    veg_df = transects_df[transects_df["veg"] == True] \
-        .groupby("transect", as_index=False)["cor_length"].sum()
-    
-    calculations_df = calculations_df.merge(veg_df, on="transect", how="left")
-    calculations_df["cor_length"] = calculations_df["cor_length"].fillna(0)  # Fill missing values with 0
-    calculations_df["pctcov_all_veg"] = calculations_df["cor_length"] / calculations_df["veg_length"]
-    calculations_df.drop(columns=["cor_length"], inplace=True)
-    
-    
-    #_______________TRANSECT WIDE_____
-    
-    # Convert codetype to string and replace NaN values with "Unknown"
-    transects_df["codetype"] = transects_df["codetype"].astype(str).fillna("Unknown")
-    # Get unique codetype values
-    unique_codetypes = transects_df["codetype"].unique()
-    
-    # Loop through each codetype and calculate percent cover
-    for codetype in unique_codetypes:
-        codetype_clean = f"pctcov_{codetype.replace(' ', '')}_transect"  # Remove spaces for column name
-        # filter transect_df to only include rows where codetype matches current iteration
-        temp_df = transects_df[transects_df["codetype"] == codetype] \
-            .groupby("transect", as_index=False)["cor_length"].sum() # sums the cor_length of each veg category for each transect
-    
-        # Merge with calculations_df
-        calculations_df = calculations_df.merge(temp_df, on="transect", how="left")
-        # Fill NaN values in 'cor_length' with 0 before calculating percent cover
-        calculations_df["cor_length"] = calculations_df["cor_length"].fillna(0)
-        # Calculate percent cover for the codetype
-        calculations_df[codetype_clean] = calculations_df["cor_length"] / calculations_df["tran_length"]
-        # Drop 'cor_length' column
-        calculations_df.drop(columns=["cor_length"], inplace=True)
-    
-    # native/nonnative plants
-    
-    # Define column name for native terrestrial plant percent cover
-    native_terrestrial_col = "pctcov_TerrestrialPlantNative_transect"
-    # Filter for only native terrestrial plants
-    native_terrestrial_df = transects_df[(transects_df["codetype"] == "Terrestrial Plant") & (transects_df["native"] == 1.0)] \
-        .groupby("transect", as_index=False)["cor_length"].sum()
-    # Merge with calculations_df
-    calculations_df = calculations_df.merge(native_terrestrial_df, on="transect", how="left")
-    # Fill NaN values in 'cor_length' with 0 before calculating percent cover
-    calculations_df["cor_length"] = calculations_df["cor_length"].fillna(0)
-    # Calculate percent cover for native terrestrial plants
-    calculations_df[native_terrestrial_col] = calculations_df["cor_length"] / calculations_df["tran_length"]
-    # Drop 'cor_length' column
-    calculations_df.drop(columns=["cor_length"], inplace=True)
-    
-    # Define column name for native terrestrial plant percent cover
-    nonnative_terrestrial_col = "pctcov_TerrestrialPlantNonnative_transect"
-    # Filter for only nonnative terrestrial plants
-    nonnative_terrestrial_df = transects_df[(transects_df["codetype"] == "Terrestrial Plant") & (transects_df["native"] == 0.0)] \
-        .groupby("transect", as_index=False)["cor_length"].sum()
-    # Merge with calculations_df
-    calculations_df = calculations_df.merge(nonnative_terrestrial_df, on="transect", how="left")
-    # Fill NaN values in 'cor_length' with 0 before calculating percent cover
-    calculations_df["cor_length"] = calculations_df["cor_length"].fillna(0)
-    # Calculate percent cover for native terrestrial plants
-    calculations_df[nonnative_terrestrial_col] = calculations_df["cor_length"] / calculations_df["tran_length"]
-    # Drop 'cor_length' column
-    calculations_df.drop(columns=["cor_length"], inplace=True)
-    
-    
-    
-    #--------DUNE----------
-    
-    # Loop to calculate percent cover for each codetype over the dune portion of the transect
-    for codetype in unique_codetypes:
-        codetype_clean_dune = f"pctcov_{codetype.replace(' ', '')}_dune"  # Clean column name for dune
-        # filter transect_df to only include rows where codetype matches current iteration
-        temp_df_dune = transects_df[(transects_df["codetype"] == codetype) & (transects_df["dune"] == True)] \
-            .groupby("transect", as_index=False)["cor_length"].sum() # sums the cor_length of each veg category for each transect
-    
-        # Merge with calculations_df
-        calculations_df = calculations_df.merge(temp_df_dune, on="transect", how="left")
-        # Fill NaN values in 'cor_length' with 0 before calculating percent cover
-        calculations_df["cor_length"] = calculations_df["cor_length"].fillna(0)
-        # Calculate percent cover for the dune portion
-        calculations_df[codetype_clean_dune] = calculations_df["cor_length"] / calculations_df["dune_length"]
-        # Drop 'cor_length' column
-        calculations_df.drop(columns=["cor_length"], inplace=True)
-    
-    # native/nonnative plants
-    
-    # Define column name for native terrestrial plant percent cover
-    native_terrestrial_dune_col = "pctcov_TerrestrialPlantNative_dune"
-    # Filter for only native terrestrial plants in the dune
-    native_terrestrial_dune_df = transects_df[(transects_df["codetype"] == "Terrestrial Plant") & (transects_df["native"] == 1.0) & (transects_df["dune"]== True)] \
-        .groupby("transect", as_index=False)["cor_length"].sum()
-    # Merge with calculations_df
-    calculations_df = calculations_df.merge(native_terrestrial_dune_df, on="transect", how="left")
-    # Fill NaN values in 'cor_length' with 0 before calculating percent cover
-    calculations_df["cor_length"] = calculations_df["cor_length"].fillna(0)
-    # Calculate percent cover for native terrestrial plants
-    calculations_df[native_terrestrial_dune_col] = calculations_df["cor_length"] / calculations_df["dune_length"]
-    # Drop 'cor_length' column
-    calculations_df.drop(columns=["cor_length"], inplace=True)
-    
-    # Define column name for native terrestrial plant percent cover
-    nonnative_terrestrial_dune_col = "pctcov_TerrestrialPlantNonnative_dune"
-    # Filter for only nonnative terrestrial plants
-    nonnative_terrestrial_dune_df = transects_df[(transects_df["codetype"] == "Terrestrial Plant") & (transects_df["native"] == 0.0) & (transects_df["dune"]== True)] \
-        .groupby("transect", as_index=False)["cor_length"].sum()
-    # Merge with calculations_df
-    calculations_df = calculations_df.merge(nonnative_terrestrial_dune_df, on="transect", how="left")
-    # Fill NaN values in 'cor_length' with 0 before calculating percent cover
-    calculations_df["cor_length"] = calculations_df["cor_length"].fillna(0)
-    # Calculate percent cover for native terrestrial plants
-    calculations_df[nonnative_terrestrial_dune_col] = calculations_df["cor_length"] / calculations_df["dune_length"]
-    # Drop 'cor_length' column
-    calculations_df.drop(columns=["cor_length"], inplace=True)
-    
-    #------------VEGETATED PORTION-----------------
-    
-    # Loop to calculate percent cover for each codetype over the dune portion of the transect
-    for codetype in unique_codetypes:
-        codetype_clean_veg = f"pctcov_{codetype.replace(' ', '')}_veg"  # Clean column name for dune
-        # filter transect_df to only include rows where codetype matches current iteration
-        temp_df_veg = transects_df[(transects_df["codetype"] == codetype) & (transects_df["veg"] == True)] \
-            .groupby("transect", as_index=False)["cor_length"].sum() # sums the cor_length of each veg category for each transect
-    
-        # Merge with calculations_df
-        calculations_df = calculations_df.merge(temp_df_veg, on="transect", how="left")
-        # Fill NaN values in 'cor_length' with 0 before calculating percent cover
-        calculations_df["cor_length"] = calculations_df["cor_length"].fillna(0)
-        # Calculate percent cover for the dune portion
-        calculations_df[codetype_clean_veg] = calculations_df["cor_length"] / calculations_df["veg_length"]
-        # Drop 'cor_length' column
-        calculations_df.drop(columns=["cor_length"], inplace=True)
-    
-    # native/nonnative plants
-    
-    # Define column name for native terrestrial plant percent cover
-    native_terrestrial_veg_col = "pctcov_TerrestrialPlantNative_veg"
-    # Filter for only native terrestrial plants in the dune
-    native_terrestrial_veg_df = transects_df[(transects_df["codetype"] == "Terrestrial Plant") & (transects_df["native"] == 1.0) & (transects_df["veg"]== True)] \
-        .groupby("transect", as_index=False)["cor_length"].sum()
-    # Merge with calculations_df
-    calculations_df = calculations_df.merge(native_terrestrial_veg_df, on="transect", how="left")
-    # Fill NaN values in 'cor_length' with 0 before calculating percent cover
-    calculations_df["cor_length"] = calculations_df["cor_length"].fillna(0)
-    # Calculate percent cover for native terrestrial plants
-    calculations_df[native_terrestrial_veg_col] = calculations_df["cor_length"] / calculations_df["veg_length"]
-    # Drop 'cor_length' column
-    calculations_df.drop(columns=["cor_length"], inplace=True)
-    
-    # Define column name for native terrestrial plant percent cover
-    nonnative_terrestrial_veg_col = "pctcov_TerrestrialPlantNonnative_veg"
-    # Filter for only nonnative terrestrial plants
-    nonnative_terrestrial_veg_df = transects_df[(transects_df["codetype"] == "Terrestrial Plant") & (transects_df["native"] == 0.0) & (transects_df["veg"]== True)] \
-        .groupby("transect", as_index=False)["cor_length"].sum()
-    # Merge with calculations_df
-    calculations_df = calculations_df.merge(nonnative_terrestrial_veg_df, on="transect", how="left")
-    # Fill NaN values in 'cor_length' with 0 before calculating percent cover
-    calculations_df["cor_length"] = calculations_df["cor_length"].fillna(0)
-    # Calculate percent cover for native terrestrial plants
-    calculations_df[nonnative_terrestrial_veg_col] = calculations_df["cor_length"] / calculations_df["veg_length"]
-    # Drop 'cor_length' column
-    calculations_df.drop(columns=["cor_length"], inplace=True)
-    
-    
-    #______SPECIES SPECIFIC_____________
-    
-    # Get unique species names
-    unique_species = transects_df["type"].dropna().unique()
-    
-    # Loop through each species
-    for species in unique_species:
-        species_clean = f"pctcov_{species.replace(' ', '')}_whole"  # Remove spaces for column name
-        
-        # Percent cover over entire transect
-        temp_df = transects_df[transects_df["type"] == species] \
-            .groupby("transect", as_index=False)["cor_length"].sum()
-        
-        calculations_df = calculations_df.merge(temp_df, on="transect", how="left")
-        calculations_df["cor_length"] = calculations_df["cor_length"].fillna(0)
-        calculations_df[species_clean] = calculations_df["cor_length"] / calculations_df["tran_length"]
-        calculations_df.drop(columns=["cor_length"], inplace=True)
-    
-        # Percent cover over dune portion
-        species_clean_dune = f"pctcov_{species.replace(' ', '')}_dune"
-        temp_df = transects_df[(transects_df["type"] == species) & (transects_df["dune"] == True)] \
-            .groupby("transect", as_index=False)["cor_length"].sum()
-        
-        calculations_df = calculations_df.merge(temp_df, on="transect", how="left")
-        calculations_df["cor_length"] = calculations_df["cor_length"].fillna(0)
-        calculations_df[species_clean_dune] = calculations_df["cor_length"] / calculations_df["dune_length"]
-        calculations_df.drop(columns=["cor_length"], inplace=True)
-    
-        # Percent cover over vegetated portion
-        species_clean_veg = f"pctcov_{species.replace(' ', '')}_veg"
-        temp_df = transects_df[(transects_df["type"] == species) & (transects_df["veg"] == True)] \
-            .groupby("transect", as_index=False)["cor_length"].sum()
-        
-        calculations_df = calculations_df.merge(temp_df, on="transect", how="left")
-        calculations_df["cor_length"] = calculations_df["cor_length"].fillna(0)
-        calculations_df[species_clean_veg] = calculations_df["cor_length"] / calculations_df["veg_length"]
-        calculations_df.drop(columns=["cor_length"], inplace=True)
+
+    # Report files that failed without dropping the rest of the batch
+    if batch_errors:
+        st.warning(f"{len(batch_errors)} workbook(s) could not be processed:")
+        st.dataframe(pd.DataFrame(batch_errors, columns=["file", "error"]))
+    if calculations_df.empty:
+        st.error("No transect data could be processed from the upload.")
+        st.stop()
 
 
-    
     # Display DataFrame
     st.subheader("Processed Transect Data")
     st.dataframe(calculations_df)
 
-    zone_option = st.radio(
-        "Select the transect portion to view percent cover for:",
-        ("whole", "dune", "veg"),
-        horizontal=True
+    zones = [col[len("pctcov_all_"):] for col in calculations_df.columns if col.startswith("pctcov_all_")]
+    chart_backend = st.radio(
+        "Chart:",
+        ["static", "interactive"],
+        format_func={"static": "Static image", "interactive": "Interactive"}.get,
+        horizontal=True,
+        help="The interactive chart sends every zone of the selected survey to the browser once, "
+             "so switching zones and hovering over bars needs no reload.",
     )
+    if chart_backend == "static":
+        zone_option = st.radio(
+            "Select the transect portion to view percent cover for:",
+            zones,
+            horizontal=True
+        )
 
     # Step 1: Let user choose a site
     sites = calculations_df["sitename"].unique()
@@ -358,41 +247,128 @@ if uploaded_file:
         (calculations_df["date"] == selected_date)
     ]
     
-    # Step 4: Define pastel colormap function
-    def get_pastel_colors(n):
-        base_cmap = cm.get_cmap('Pastel1' if n <= 9 else 'Pastel2')  # Pastel1: 9 colors, Pastel2: 8
-        if n > base_cmap.N:
-            return [base_cmap(i / n) for i in range(n)]
+    # Step 4: Plot (rendered charts are cached per selection)
+    with run_timer.stage("plot", rows=len(filtered_df)):
+        if chart_backend == "static":
+            chart_png = cached_chart_png(digest, zone_method, selected_site, selected_date, zone_option, filtered_df)
         else:
-            return [base_cmap(i) for i in range(n)]
-    
-    # Step 5: Prepare the dataframe for plotting
-    zone_suffix = f"_{zone_option}"
-    stack_df = filtered_df[["transect"] + [col for col in filtered_df.columns if col.endswith(zone_suffix)]].copy()
-    stack_df.columns = ["transect"] + [col.replace("pctcov_", "").replace(zone_suffix, "") for col in stack_df.columns[1:]]
-    
-    # Remove species columns with all zero percent cover
-    nonzero_cols = [col for col in stack_df.columns[1:] if stack_df[col].sum() > 0]
-    stack_df = stack_df[["transect"] + nonzero_cols]
-    
-    # Plot if there's data to show
-    if len(stack_df.columns) > 1:
-        stack_df.set_index("transect", inplace=True)
-        fig, ax = plt.subplots(figsize=(10, 6))
-        colors = get_pastel_colors(len(stack_df.columns))
-        stack_df.plot(kind="barh", stacked=True, ax=ax, color=colors)
-        ax.set_title(f"Species Composition – {selected_site}, {selected_date} ({zone_option.capitalize()})")
-        ax.set_xlabel("Percent Cover")
-        ax.set_ylabel("Transect")
-        plt.tight_layout()
-        st.pyplot(fig)
-    else:
-        st.info("No species with non-zero coverage for this selection.")
+            long_chart_df = cached_chart_data(digest, zone_method, selected_site, selected_date, zones, filtered_df)
+            chart_png = None
+        if chart_png is not None:
+            st.image(chart_png, width="stretch")
+        elif chart_backend == "interactive" and not long_chart_df.empty:
+            st.vega_lite_chart(
+                long_chart_df,
+                vega_lite_spec(zones, f"Species Composition – {selected_site}, {selected_date}", long_chart_df["category"].nunique()),
+                width="stretch",
+            )
+        else:
+            st.info("No species with non-zero coverage for this selection.")
 
 
 
     # Allow user to download processed data
     st.subheader("Download Processed Data")
-    csv = calculations_df.to_csv(index=False).encode()
-    st.download_button("Download CSV", csv, "processed_transect_data.csv", "text/csv")
+    export_format = st.radio("Format", list(EXPORT_FORMATS), horizontal=True,
+                             help="Parquet and Feather are much faster to load in pandas/R for large multi-year tables")
+    export_layout = st.radio("Layout", LAYOUTS, horizontal=True,
+                             help="wide: one pctcov column per category and zone; long: one row per transect, zone and category with non-zero cover")
+    # The file is only built when the button is clicked, not on every rerun, so
+    # its timing is kept in session state and shown on the next rerun
+    export_timer = st.session_state.setdefault("export_timer", StageTimer())
+
+    def build_export():
+        export_timer.stages.clear()
+        with export_timer.stage("export", rows=len(calculations_df)):
+            return export_bytes(calculations_df, export_format, export_layout)
+
+    st.download_button(
+        f"Download {export_format.upper()}",
+        build_export,
+        export_file_name(export_format, export_layout),
+        EXPORT_FORMATS[export_format][1],
+    )
+
+    # Save these transects so later time series don't need the workbook re-uploaded
+    if STORE_PATH:
+        st.subheader("Results Store")
+        if st.button("Save these transects to the results store"):
+            with ResultsStore(STORE_PATH) as store:
+                saved = store.upsert(calculations_df, zone_method)
+            st.success(f"Saved {saved} transects (existing ones with the same site, date, transect and zone method were replaced).")
+        with st.expander("Stored surveys"):
+            with ResultsStore(STORE_PATH) as store:
+                st.dataframe(store.surveys().drop(columns="updated_at"))
+
+    # Time series, survey-to-survey change and network summaries across every
+    # site and date, rather than one selected survey
+    st.subheader("Compare Surveys")
+    compare_source = "upload"
+    if STORE_PATH:
+        compare_source = st.radio(
+            "Surveys to compare:",
+            ["upload", "store"],
+            format_func={"upload": "This upload", "store": "Results store"}.get,
+            horizontal=True,
+        )
+    if compare_source == "store":
+        with ResultsStore(STORE_PATH) as store:
+            compare_df = store.load(zone_method=zone_method)
+    else:
+        compare_df = calculations_df
+
+    if compare_df.empty:
+        st.info("The results store has no transects for this zone method; save some to it first.")
+    else:
+        stats, changes, network = survey_trends(compare_df)
+        compare_zone = st.selectbox("Zone", list(stats["zone"].cat.categories), key="compare_zone")
+        zone_stats = stats[stats["zone"] == compare_zone]
+        compare_categories = sorted(zone_stats["category"].unique())
+        compare_category = st.selectbox(
+            "Category", compare_categories,
+            index=compare_categories.index("all") if "all" in compare_categories else 0,
+            key="compare_category",
+        )
+        compare_sites = st.multiselect("Sites", sorted(stats["sitename"].unique()), default=sorted(stats["sitename"].unique()))
+
+        series = zone_stats[(zone_stats["category"] == compare_category) & zone_stats["sitename"].isin(compare_sites)]
+        st.vega_lite_chart(
+            series,
+            trend_spec(f"{compare_category} cover – {compare_zone.capitalize()} (mean and 95% bootstrap CI across transects)"),
+            width="stretch",
+        )
+        st.caption("Change between consecutive surveys of each site")
+        st.dataframe(
+            changes[(changes["zone"] == compare_zone) & (changes["category"] == compare_category) & changes["sitename"].isin(compare_sites)],
+            hide_index=True,
+        )
+        st.caption("All sites by year")
+        st.dataframe(network[(network["zone"] == compare_zone) & (network["category"] == compare_category)], hide_index=True)
+        st.download_button(
+            "Download survey statistics (CSV)",
+            lambda: stats.to_csv(index=False).encode(),
+            "survey_statistics.csv",
+            "text/csv",
+        )
 
+    # Where the time and memory went, for reporting slow uploads
+    with st.expander("Diagnostics", expanded=profile_text is not None):
+        diagnostics = StageTimer()
+        diagnostics.extend(pipeline_stages)
+        diagnostics.extend(run_timer)
+        diagnostics.extend(export_timer)
+        st.caption(
+            f"Pipeline {'from cache' if cache_hit else 'computed this run'}; "
+            "parse:<sheet> rows break down the parse stage; export is the last download."
+        )
+        st.dataframe(diagnostics.to_frame())
+        st.download_button(
+            "Download diagnostics (JSON)",
+            diagnostics.to_json(upload=digest[:12], files=[name for name, _ in files], zone_method=zone_method,
+                                cache_hit=cache_hit, total_seconds=diagnostics.total_seconds()),
+            "transect_diagnostics.json",
+            "application/json",
+        )
+        if profile_text is not None:
+            st.code(profile_text)
+            st.download_button("Download profile (.prof)", profile_data, "transect_profile.prof", "application/octet-stream")
@@ -0,0 +1,127 @@
+import os
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+
+from transect_processing import CODETYPE_SUFFIXES
+
+
+# Rows written per chunk, so large exports are never held as one giant string
+CHUNK_ROWS = 50_000
+
+EXPORT_FORMATS = {
+    "csv": ("csv", "text/csv"),
+    "parquet": ("parquet", "application/vnd.apache.parquet"),
+    "feather": ("feather", "application/vnd.apache.arrow.file"),
+}
+
+LAYOUTS = ("wide", "long")
+
+# Columns are pctcov_<category>_<zone>; codetype columns over the whole
+# transect use "_transect" instead of "_whole"
+ZONE_BY_SUFFIX = {suffix: zone for zone, suffix in CODETYPE_SUFFIXES.items()}
+
+
+def pctcov_columns(columns):
+    """Split the pctcov_<category>_<zone> columns among `columns` into
+    (pct_cols, zones, categories) lists, plus the zone names in table order.
+
+    The zones are whatever pctcov_all_<zone> columns exist (whole/dune/veg
+    plus any user-defined zones).
+    """
+    zone_names = [col[len("pctcov_all_"):] for col in columns if col.startswith("pctcov_all_")]
+    suffixes = dict(ZONE_BY_SUFFIX, **{zone: zone for zone in zone_names})
+
+    pct_cols = []
+    zones = []
+    categories = []
+    for col in columns:
+        if not col.startswith("pctcov_"):
+            continue
+        category, _, suffix = col[len("pctcov_"):].rpartition("_")
+        if suffix in suffixes and category:
+            pct_cols.append(col)
+            zones.append(suffixes[suffix])
+            categories.append(category)
+    return pct_cols, zones, categories, zone_names
+
+
+def to_long(calculations_df):
+    """Reshape the wide pctcov_<category>_<zone> table to one row per
+    (transect, zone, category) with non-zero cover.
+
+    Zero and undefined (NaN, e.g. a zero-length dune) cover is skipped, so
+    the result only holds what was actually recorded. sitename and date are
+    carried along so the long table can be filtered without parsing keys.
+    """
+    pct_cols, zones, categories, zone_names = pctcov_columns(calculations_df.columns)
+
+    values = calculations_df[pct_cols].to_numpy(dtype=float)
+    rows, cols = np.nonzero((values != 0) & ~np.isnan(values))
+    zones = np.asarray(zones, dtype=object)
+    categories = np.asarray(categories, dtype=object)
+
+    return pd.DataFrame({
+        "transect": calculations_df["transect"].to_numpy()[rows],
+        "sitename": calculations_df["sitename"].to_numpy()[rows],
+        "date": calculations_df["date"].to_numpy()[rows],
+        "zone": pd.Categorical(zones[cols], categories=zone_names),
+        "category": pd.Categorical(categories[cols]),
+        "pctcov": values[rows, cols],
+    })
+
+
+def _chunks(df, chunk_rows):
+    for start in range(0, max(len(df), 1), chunk_rows):
+        yield start, df.iloc[start:start + chunk_rows]
+
+
+def write_table(df, target, fmt="csv", chunk_rows=CHUNK_ROWS):
+    """Write df to a path or binary file object, chunk_rows rows at a time.
+
+    CSV is appended chunk by chunk; Parquet gets one row group per chunk and
+    Feather one record batch per chunk, so only one chunk is ever converted
+    at a time. Parquet/Feather need pyarrow.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format {fmt!r}; expected one of {', '.join(EXPORT_FORMATS)}")
+
+    if fmt == "csv":
+        handle = open(target, "wb") if isinstance(target, (str, os.PathLike)) else target
+        try:
+            for start, chunk in _chunks(df, chunk_rows):
+                handle.write(chunk.to_csv(index=False, header=start == 0).encode())
+        finally:
+            if handle is not target:
+                handle.close()
+        return
+
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError(f"{fmt} export needs pyarrow (pip install pyarrow)") from None
+
+    # One schema for the whole frame so every chunk is written with the same types
+    schema = pa.Schema.from_pandas(df, preserve_index=False)
+    writer = pq.ParquetWriter(target, schema) if fmt == "parquet" else pa.ipc.new_file(target, schema)
+    with writer:
+        for _, chunk in _chunks(df, chunk_rows):
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+
+
+def export_bytes(calculations_df, fmt="csv", layout="wide"):
+    """The contents of a download for the given format and layout."""
+    if layout not in LAYOUTS:
+        raise ValueError(f"Unknown layout {layout!r}; expected one of {', '.join(LAYOUTS)}")
+    df = to_long(calculations_df) if layout == "long" else calculations_df
+    buffer = BytesIO()
+    write_table(df, buffer, fmt)
+    return buffer.getvalue()
+
+
+def export_file_name(fmt="csv", layout="wide", stem="processed_transect_data"):
+    extension, _ = EXPORT_FORMATS[fmt]
+    suffix = "_long" if layout == "long" else ""
+    return f"{stem}{suffix}.{extension}"
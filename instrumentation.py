@@ -0,0 +1,94 @@
+import cProfile
+import io
+import json
+import os
+import pstats
+import time
+from contextlib import contextmanager
+
+import pandas as pd
+
+
+def rss_bytes():
+    """Current resident memory of this process, or None if unavailable."""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+        # Peak rather than current outside Linux, but still shows growth
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if os.uname().sysname == "Darwin" else peak * 1024
+    except (ImportError, AttributeError):
+        return None
+
+
+class StageTimer:
+    """Collects wall time, row counts and memory change per pipeline stage.
+
+        timer = StageTimer()
+        with timer.stage("classify") as stage:
+            ...
+            stage["rows"] = len(transects_df)
+        timer.to_frame()
+    """
+
+    def __init__(self):
+        self.stages = []
+
+    @contextmanager
+    def stage(self, name, rows=None):
+        record = {"stage": name, "seconds": None, "rows": rows, "memory_delta_mb": None}
+        memory_before = rss_bytes()
+        started = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record["seconds"] = time.perf_counter() - started
+            memory_after = rss_bytes()
+            if memory_before is not None and memory_after is not None:
+                record["memory_delta_mb"] = (memory_after - memory_before) / 2**20
+            self.stages.append(record)
+
+    def record(self, name, seconds, rows=None):
+        """Add a stage timed elsewhere (e.g. the loader's per-sheet times)."""
+        self.stages.append({"stage": name, "seconds": seconds, "rows": rows, "memory_delta_mb": None})
+
+    def extend(self, other):
+        self.stages.extend(other.stages if isinstance(other, StageTimer) else other)
+
+    def total_seconds(self):
+        return sum(record["seconds"] or 0 for record in self.stages if ":" not in record["stage"])
+
+    def to_frame(self):
+        return pd.DataFrame(self.stages, columns=["stage", "seconds", "rows", "memory_delta_mb"])
+
+    def to_json(self, **extra):
+        return json.dumps({**extra, "stages": self.stages}, indent=2, default=str)
+
+
+def profile_call(func, *args, top=25, **kwargs):
+    """Run func under cProfile.
+
+    Returns (result, stats_text, prof_bytes): the top functions by cumulative
+    time as text, and the raw .prof data, which snakeviz, tuna or flameprof
+    can turn into a flame graph.
+    """
+    profiler = cProfile.Profile()
+    result = profiler.runcall(func, *args, **kwargs)
+    text = io.StringIO()
+    pstats.Stats(profiler, stream=text).sort_stats("cumulative").print_stats(top)
+
+    # pstats can only dump to a path
+    import tempfile
+    with tempfile.NamedTemporaryFile(suffix=".prof", delete=False) as handle:
+        path = handle.name
+    try:
+        profiler.dump_stats(path)
+        with open(path, "rb") as handle:
+            prof_bytes = handle.read()
+    finally:
+        os.remove(path)
+    return result, text.getvalue(), prof_bytes
@@ -0,0 +1,130 @@
+"""Command-line percent cover processing, without the Streamlit app.
+
+    python process_transects.py survey1.xlsx survey2.xlsx -o processed_transect_data.csv
+    python process_transects.py data/ --jobs 4
+    python process_transects.py data/ --split -o processed/
+    python process_transects.py data/ --format parquet --layout long
+    python process_transects.py new_survey.xlsx --store transect_results.sqlite
+
+Inputs can be .xlsx workbooks, .zip archives of them or directories (searched
+recursively). Only pandas/openpyxl are imported; Streamlit and matplotlib are
+never loaded.
+"""
+import argparse
+import os
+import sys
+from pathlib import Path
+
+from batch_processing import combine_results, expand_uploads, iter_batch
+from exports import EXPORT_FORMATS, LAYOUTS, export_file_name, to_long, write_table
+from results_store import ResultsStore
+from transect_processing import ZONE_METHODS
+
+
+def collect_workbooks(inputs):
+    """Resolve the command-line inputs to (name, source) pairs.
+
+    Workbooks are passed to the workers by path; zip members are read into
+    memory since they have no path of their own. Returns (workbooks, errors),
+    errors being (name, message) for every archive that couldn't be read.
+    """
+    paths = []
+    for item in inputs:
+        path = Path(item)
+        if path.is_dir():
+            paths.extend(sorted(p for p in path.rglob("*") if p.suffix.lower() in (".xlsx", ".zip") and not p.name.startswith("~$")))
+        else:
+            paths.append(path)
+
+    workbooks = []
+    errors = []
+    for path in paths:
+        if path.suffix.lower() == ".zip":
+            try:
+                data = path.read_bytes()
+            except OSError as exc:
+                errors.append((str(path), f"{type(exc).__name__}: {exc}"))
+                continue
+            members, archive_errors = expand_uploads([(str(path), data)])
+            workbooks.extend(members)
+            errors.extend(archive_errors)
+        else:
+            workbooks.append((str(path), str(path)))
+    return workbooks, errors
+
+
+def _split_output_path(output_dir, name, used, fmt, layout):
+    stem = name[:-5] if name.lower().endswith(".xlsx") else name
+    stem = stem.replace(os.sep, "_").replace("/", "_").lstrip("._") or "workbook"
+    candidate = export_file_name(fmt, layout, f"{stem}_processed")
+    count = 1
+    while candidate in used:
+        count += 1
+        candidate = export_file_name(fmt, layout, f"{stem}_processed_{count}")
+    used.add(candidate)
+    return Path(output_dir) / candidate
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Calculate transect percent cover from dune survey workbooks.")
+    parser.add_argument("inputs", nargs="+", help=".xlsx workbooks, .zip archives or directories")
+    parser.add_argument("-o", "--output", help="output file (default processed_transect_data.<format>), or directory with --split")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="worker processes (default: one per CPU)")
+    parser.add_argument("--split", action="store_true", help="write one file per workbook as soon as it finishes instead of one combined file")
+    parser.add_argument("-f", "--format", choices=list(EXPORT_FORMATS), default="csv", help="output format (default csv; parquet/feather need pyarrow)")
+    parser.add_argument("--layout", choices=LAYOUTS, default="wide", help="wide pctcov_* columns, or long rows of non-zero (transect, zone, category) cover")
+    parser.add_argument("--zones", choices=ZONE_METHODS, default="flags",
+                        help="flags: original dune/veg endpoint flags (default); overlap: apportion intercepts by exact zone overlap, incl. a Zones sheet")
+    parser.add_argument("--store", metavar="PATH", help="also save every processed transect to this SQLite results store")
+    args = parser.parse_args(argv)
+
+    def write(calculations_df, target):
+        write_table(to_long(calculations_df) if args.layout == "long" else calculations_df, target, args.format)
+
+    workbooks, input_errors = collect_workbooks(args.inputs)
+    if not workbooks and not input_errors:
+        print("No .xlsx workbooks found.", file=sys.stderr)
+        return 2
+
+    if args.split:
+        output_dir = Path(args.output or "processed")
+        output_dir.mkdir(parents=True, exist_ok=True)
+        used = set()
+    store = ResultsStore(args.store) if args.store else None
+    frames = []
+    failures = len(input_errors)
+    for name, error in input_errors:
+        print(f"FAILED {name}: {error}", file=sys.stderr)
+    for name, calculations_df, error in iter_batch(workbooks, max_workers=args.jobs, zone_method=args.zones):
+        if error is not None:
+            failures += 1
+            print(f"FAILED {name}: {error}", file=sys.stderr)
+            continue
+        if store is not None:
+            store.upsert(calculations_df, args.zones)
+        if args.split:
+            path = _split_output_path(output_dir, name, used, args.format, args.layout)
+            write(calculations_df, path)
+            print(f"ok     {name}: {len(calculations_df)} transects -> {path}", file=sys.stderr)
+        else:
+            frames.append((name, calculations_df))
+            print(f"ok     {name}: {len(calculations_df)} transects", file=sys.stderr)
+
+    if not args.split and frames:
+        # Combine in the order the inputs were given, not the order they finished
+        order = {name: i for i, (name, _) in enumerate(workbooks)}
+        frames.sort(key=lambda item: order[item[0]])
+        output = args.output or export_file_name(args.format, args.layout)
+        write(combine_results([frame for _, frame in frames]), output)
+        print(f"Wrote {output}", file=sys.stderr)
+
+    if store is not None:
+        store.close()
+        print(f"Saved to {args.store}", file=sys.stderr)
+    total = len(workbooks) + len(input_errors)
+    print(f"{total - failures} of {total} workbooks processed", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
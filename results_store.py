@@ -0,0 +1,240 @@
+import sqlite3
+import time
+
+import numpy as np
+import pandas as pd
+
+from exports import pctcov_columns
+from transect_processing import ZONE_METHODS
+
+
+DEFAULT_STORE_PATH = "transect_results.sqlite"
+
+# Per-transect columns of calculations_df. User-defined zones add a
+# <zone>_length column each; everything else is a pctcov_* column.
+BASE_COLUMNS = ["transect", "sitename", "date", "tran_length", "dune_length", "veg_length"]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS transects (
+    transect TEXT NOT NULL,
+    zone_method TEXT NOT NULL,
+    sitename TEXT,
+    date TEXT,
+    tran_length REAL,
+    dune_length REAL,
+    veg_length REAL,
+    updated_at REAL,
+    PRIMARY KEY (transect, zone_method)
+);
+CREATE INDEX IF NOT EXISTS transects_method_site_date ON transects (zone_method, sitename, date);
+CREATE TABLE IF NOT EXISTS cover (
+    transect TEXT NOT NULL,
+    zone_method TEXT NOT NULL,
+    column_name TEXT NOT NULL,
+    pctcov REAL,
+    PRIMARY KEY (transect, zone_method, column_name)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS zone_lengths (
+    transect TEXT NOT NULL,
+    zone_method TEXT NOT NULL,
+    column_name TEXT NOT NULL,
+    length REAL,
+    PRIMARY KEY (transect, zone_method, column_name)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS cover_columns (
+    column_name TEXT PRIMARY KEY,
+    position INTEGER
+);
+CREATE TABLE IF NOT EXISTS survey_columns (
+    sitename TEXT,
+    date TEXT,
+    zone_method TEXT,
+    column_name TEXT,
+    PRIMARY KEY (sitename, date, zone_method, column_name)
+) WITHOUT ROWID;
+"""
+
+def _is_length_column(col):
+    return col.endswith("_length") and col not in BASE_COLUMNS
+
+
+class ResultsStore:
+    """Processed transects kept in a local SQLite file, keyed by the
+    sitename_date_transect key the pipeline builds and the zone method
+    (transect_processing.ZONE_METHODS) that produced them, so results of
+    the two methods are kept apart.
+
+    Cover is stored sparsely, one row per transect and non-zero pctcov_*
+    column, so surveys with different species lists share one table;
+    lengths of user-defined zones are kept per transect next to it. The
+    columns each survey had are remembered, so load() rebuilds the wide
+    calculations_df layout with the same columns (in the order they were
+    first stored).
+    """
+
+    def __init__(self, path=DEFAULT_STORE_PATH):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript(SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.connection.close()
+
+    def upsert(self, calculations_df, zone_method="flags"):
+        """Insert or replace the transects in calculations_df, computed with
+        `zone_method`.
+
+        Only those transects of that zone method are touched; their previous
+        cover rows are dropped first so a category removed from a re-upload
+        doesn't linger. Returns the number of transects written.
+        """
+        if zone_method not in ZONE_METHODS:
+            raise ValueError(f"Unknown zone method {zone_method!r}; expected one of {', '.join(ZONE_METHODS)}")
+        calculations_df = calculations_df.dropna(subset=["transect"]).drop_duplicates("transect", keep="last")
+        length_cols = [col for col in calculations_df.columns if _is_length_column(col)]
+        pct_cols = [col for col in calculations_df.columns if col not in BASE_COLUMNS and col not in length_cols]
+        transects = calculations_df["transect"].astype(str).to_numpy()
+
+        values = calculations_df[pct_cols].to_numpy(dtype=float)
+        rows, cols = np.nonzero(values != 0)
+        cover_rows = zip(
+            transects[rows].tolist(),
+            [zone_method] * len(rows),
+            np.asarray(pct_cols, dtype=object)[cols].tolist(),
+            [None if np.isnan(v) else v for v in values[rows, cols].tolist()],
+        )
+        # Unlike cover, a zero length is kept; only undefined zones are left out
+        lengths = calculations_df[length_cols].to_numpy(dtype=float)
+        rows, cols = np.nonzero(~np.isnan(lengths))
+        length_rows = zip(
+            transects[rows].tolist(),
+            [zone_method] * len(rows),
+            np.asarray(length_cols, dtype=object)[cols].tolist(),
+            lengths[rows, cols].tolist(),
+        )
+
+        base = calculations_df[BASE_COLUMNS[1:]].astype(object).where(calculations_df[BASE_COLUMNS[1:]].notna(), None)
+        base["sitename"] = base["sitename"].map(lambda v: None if v is None else str(v))
+        base["date"] = base["date"].map(lambda v: None if v is None else str(v))
+        now = time.time()
+        transect_rows = [(t, zone_method, *row, now) for t, row in zip(transects.tolist(), base.itertuples(index=False, name=None))]
+        surveys = base[["sitename", "date"]].drop_duplicates().itertuples(index=False, name=None)
+        survey_columns = [(sitename, date, zone_method, col) for sitename, date in surveys for col in length_cols + pct_cols]
+        keys = [(t, zone_method) for t in transects.tolist()]
+
+        with self.connection:
+            known = self.connection.execute("SELECT COUNT(*) FROM cover_columns").fetchone()[0]
+            self.connection.executemany(
+                "INSERT OR IGNORE INTO cover_columns (column_name, position) VALUES (?, ?)",
+                [(col, known + i) for i, col in enumerate(length_cols + pct_cols)],
+            )
+            self.connection.executemany(
+                "INSERT OR IGNORE INTO survey_columns (sitename, date, zone_method, column_name) VALUES (?, ?, ?, ?)",
+                survey_columns,
+            )
+            self.connection.executemany("DELETE FROM cover WHERE transect = ? AND zone_method = ?", keys)
+            self.connection.executemany("DELETE FROM zone_lengths WHERE transect = ? AND zone_method = ?", keys)
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO transects "
+                "(transect, zone_method, sitename, date, tran_length, dune_length, veg_length, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                transect_rows,
+            )
+            self.connection.executemany(
+                "INSERT INTO cover (transect, zone_method, column_name, pctcov) VALUES (?, ?, ?, ?)", cover_rows
+            )
+            self.connection.executemany(
+                "INSERT INTO zone_lengths (transect, zone_method, column_name, length) VALUES (?, ?, ?, ?)", length_rows
+            )
+        return len(transect_rows)
+
+    def surveys(self):
+        """One row per stored (zone_method, sitename, date) with its transect count."""
+        return pd.read_sql_query(
+            "SELECT zone_method, sitename, date, COUNT(*) AS transects, MAX(updated_at) AS updated_at "
+            "FROM transects GROUP BY zone_method, sitename, date ORDER BY zone_method, sitename, date",
+            self.connection,
+        )
+
+    def load(self, sitenames=None, start=None, end=None, zone_method="flags"):
+        """Stored transects computed with `zone_method` as a wide calculations_df.
+
+        Filter by a list of site names and/or an inclusive range of days:
+        start and end are anything pd.Timestamp accepts, and any time of
+        day is ignored, so end="2024-01-01" includes surveys on that day.
+        Uses the (zone_method, sitename, date) index; nothing is recomputed.
+        """
+        where = ["t.zone_method = ?"]
+        params = [zone_method]
+        if sitenames is not None:
+            sitenames = list(sitenames)
+            where.append(f"t.sitename IN ({', '.join('?' * len(sitenames))})")
+            params.extend(sitenames)
+        # Dates are stored as text ("YYYY-MM-DD" with or without a time), so
+        # a day's surveys sort from "YYYY-MM-DD" up to the next day
+        if start is not None:
+            where.append("t.date >= ?")
+            params.append(pd.Timestamp(start).strftime("%Y-%m-%d"))
+        if end is not None:
+            where.append("t.date < ?")
+            params.append((pd.Timestamp(end).normalize() + pd.Timedelta(days=1)).strftime("%Y-%m-%d"))
+        clause = f"WHERE {' AND '.join(where)}"
+
+        base = pd.read_sql_query(
+            f"SELECT {', '.join(BASE_COLUMNS)} FROM transects t {clause} ORDER BY t.sitename, t.date, t.transect",
+            self.connection, params=params,
+        )
+        cover = pd.read_sql_query(
+            "SELECT c.transect, c.column_name, c.pctcov FROM cover c "
+            f"JOIN transects t ON t.transect = c.transect AND t.zone_method = c.zone_method {clause}",
+            self.connection, params=params,
+        )
+        lengths = pd.read_sql_query(
+            "SELECT z.transect, z.column_name, z.length FROM zone_lengths z "
+            f"JOIN transects t ON t.transect = z.transect AND t.zone_method = z.zone_method {clause}",
+            self.connection, params=params,
+        )
+        survey_columns = pd.read_sql_query(
+            "SELECT sc.sitename, sc.date, sc.column_name, cc.position FROM survey_columns sc "
+            "JOIN cover_columns cc ON cc.column_name = sc.column_name "
+            f"JOIN (SELECT DISTINCT t.sitename, t.date, t.zone_method FROM transects t {clause}) s "
+            "ON s.sitename IS sc.sitename AND s.date IS sc.date AND s.zone_method = sc.zone_method",
+            self.connection, params=params,
+        )
+        columns = survey_columns.drop_duplicates("column_name").sort_values("position")["column_name"].tolist()
+        length_cols = [col for col in columns if _is_length_column(col)]
+        pct_cols = [col for col in columns if col not in length_cols]
+
+        # Cover not stored for a transect is zero if its survey defines the
+        # column's zone, and NaN otherwise
+        row_index = pd.Index(base["transect"])
+        wide_lengths = np.full((len(base), len(length_cols)), np.nan)
+        wide_lengths[row_index.get_indexer(lengths["transect"]), pd.Index(length_cols).get_indexer(lengths["column_name"])] = (
+            lengths["length"].to_numpy(dtype=float)
+        )
+        zone_by_column = dict(zip(*pctcov_columns(pct_cols)[:2]))
+        column_zones, zones = pd.factorize(pd.Index([zone_by_column.get(col, "whole") for col in pct_cols]))
+        defined = base[["sitename", "date"]].reset_index().merge(
+            survey_columns[survey_columns["column_name"].str.startswith("pctcov_all_")], on=["sitename", "date"]
+        )
+        defines_zone = np.zeros((len(base), len(zones)), dtype=bool)
+        zone_codes = zones.get_indexer(defined["column_name"].str[len("pctcov_all_"):])
+        defines_zone[defined["index"].to_numpy()[zone_codes >= 0], zone_codes[zone_codes >= 0]] = True
+        wide = np.where(defines_zone[:, column_zones], 0.0, np.nan)
+        wide[row_index.get_indexer(cover["transect"]), pd.Index(pct_cols).get_indexer(cover["column_name"])] = (
+            cover["pctcov"].to_numpy(dtype=float)
+        )
+
+        try:
+            base["date"] = pd.to_datetime(base["date"], format="ISO8601")
+        except (ValueError, TypeError):
+            pass
+        return pd.concat(
+            [base, pd.DataFrame(wide_lengths, columns=length_cols), pd.DataFrame(wide, columns=pct_cols)], axis=1
+        )
@@ -0,0 +1,81 @@
+"""Small hand-made workbook sheets shared by the tests."""
+import numpy as np
+import pandas as pd
+
+
+KEYS = ["S1_2024-01-01_A", "S1_2024-01-01_B", "S2_2024-02-01_A", "S2_2024-02-01_C"]
+
+
+def readme():
+    # Names with stray spaces, a species without native status and one
+    # without a codetype
+    return pd.DataFrame({
+        "codetype": ["Terrestrial Plant", "Terrestrial Plant", "Wrack", "Terrestrial Plant", "Bare Ground", np.nan],
+        "name": ["ABC ", "DEF", "WR", " GHI", "BG", "XYZ"],
+        "native": [1.0, 0.0, np.nan, np.nan, np.nan, 1.0],
+    })
+
+
+def positional():
+    return pd.DataFrame({
+        "sitename": ["S1", "S1", "S2", "S2"],
+        "date": pd.to_datetime(["2024-01-01", "2024-01-01", "2024-02-01", "2024-02-01"]),
+        "transect": ["A", "B", "A", "C"],
+        "eastend": [0.0, 0.0, 0.0, 0.0],
+        "toe_in": [5.0, 4.0, 6.0, 3.0],
+        "toe_sea": [15.0, 14.0, 16.0, 13.0],
+        "lowest_veg": [20.0, 18.0, 25.0, 30.0],
+        "HTS": [40.0, 35.0, 50.0, 45.0],
+    })
+
+
+def transects(dirty=False):
+    df = pd.DataFrame({
+        "sitename": ["S1", "S1", "S1", "S1", "S2", "S2", "S2"],
+        "date": pd.to_datetime(["2024-01-01"] * 4 + ["2024-02-01"] * 3),
+        "transect": ["A", "A", "B", "B", "A", "A", "C"],
+        "start": [1.0, 6.0, 2.0, 13.0, 14.0, 4.0, 1.0],
+        "end": [3.0, 8.0, 5.0, 16.0, 18.0, 7.0, 3.0],
+        "type": ["ABC", " DEF ", "WR", "ABC-D", "GHI", "BG", "BG"],
+        "cor_length": [2.0, 2.0, 3.0, 3.0, 4.0, 1.5, 2.0],
+    })
+    if dirty:
+        # A blank type, an unknown type without a length, an intercept on a
+        # transect missing from PositionalCharacteristics and a blank row
+        df.loc[5, "type"] = np.nan
+        extra = pd.DataFrame({
+            "sitename": ["S2", "S1", None],
+            "date": pd.to_datetime(["2024-02-01", "2024-01-01", None]),
+            "transect": ["A", "Z", None],
+            "start": [22.0, 1.0, np.nan],
+            "end": [24.0, 2.0, np.nan],
+            "type": ["QQQ", "ABC", None],
+            "cor_length": [np.nan, 1.0, np.nan],
+        })
+        df = pd.concat([df, extra], ignore_index=True)
+    return df
+
+
+def back_dune_zones():
+    """A Zones sheet with a "back dune" on the two A transects; the bounds
+    of the first row are given in reverse."""
+    return pd.DataFrame({
+        "sitename": ["S1", "S2"],
+        "date": pd.to_datetime(["2024-01-01", "2024-02-01"]),
+        "transect": ["A", "A"],
+        "zone": ["back dune", "back dune"],
+        "zone_start": [4.0, 15.0],
+        "zone_end": [0.0, 20.0],
+    })
+
+
+def separate_workbooks():
+    """calculations_df of S1 (with its back dune zone) and of S2 (without
+    a Zones sheet) processed as two workbooks with the overlap method."""
+    from transect_processing import process_sheets
+
+    frames = []
+    for sitename, zones_sheet in [("S1", back_dune_zones().iloc[:1]), ("S2", None)]:
+        sheets = [df[df["sitename"] == sitename].reset_index(drop=True) for df in (positional(), transects())]
+        frames.append(process_sheets(*sheets, readme(), "overlap", zones_sheet))
+    return frames
@@ -0,0 +1,21 @@
+import numpy as np
+import pandas as pd
+
+from batch_processing import combine_results
+from sheets import separate_workbooks
+
+
+def test_combine_results_leaves_undefined_zones_nan():
+    s1_df, s2_df = separate_workbooks()
+    combined = combine_results([s1_df, s2_df])
+
+    assert combined["transect"].tolist() == s1_df["transect"].tolist() + s2_df["transect"].tolist()
+    pd.testing.assert_frame_equal(combined.iloc[:len(s1_df)][s1_df.columns], s1_df, check_dtype=False)
+
+    s2_rows = combined.iloc[len(s1_df):].reset_index(drop=True)
+    backdune_cols = [col for col in combined.columns if col.endswith("_backdune") or col == "backdune_length"]
+    assert backdune_cols and s2_rows[backdune_cols].isna().all().all()
+    # Species S2 didn't record are zero cover in the zones it does have
+    assert "pctcov_ABC_dune" not in s2_df
+    assert (s2_rows["pctcov_ABC_dune"] == 0).all()
+    assert np.isnan(s1_df.loc[1, "pctcov_all_backdune"])
@@ -0,0 +1,64 @@
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from exports import export_bytes, to_long, write_table
+from sheets import back_dune_zones, positional, readme, transects
+from transect_processing import process_sheets
+
+
+def calculations():
+    # Exact overlap with a back dune only on the A transects, so some cover is NaN
+    return process_sheets(positional(), transects(), readme(), "overlap", back_dune_zones())
+
+
+def test_csv_written_one_row_per_chunk_round_trips():
+    calculations_df = calculations()
+    buffer = io.BytesIO()
+    write_table(calculations_df, buffer, "csv", chunk_rows=1)
+
+    result = pd.read_csv(io.BytesIO(buffer.getvalue()), parse_dates=["date"])
+    pd.testing.assert_frame_equal(result, calculations_df, check_dtype=False)
+
+
+@pytest.mark.parametrize("fmt", ["parquet", "feather"])
+def test_columnar_written_one_row_per_chunk_round_trips(fmt, tmp_path):
+    pytest.importorskip("pyarrow")
+    calculations_df = calculations()
+    path = tmp_path / f"out.{fmt}"
+    write_table(calculations_df, path, fmt, chunk_rows=1)
+
+    result = pd.read_parquet(path) if fmt == "parquet" else pd.read_feather(path)
+    pd.testing.assert_frame_equal(result, calculations_df, check_dtype=False)
+
+
+def test_empty_table_still_gets_a_header():
+    calculations_df = calculations().iloc[:0]
+    assert export_bytes(calculations_df, "csv").decode().splitlines() == [",".join(calculations_df.columns)]
+
+
+def test_to_long_keeps_only_recorded_cover():
+    calculations_df = calculations()
+    long_df = to_long(calculations_df)
+
+    pct_cols = [col for col in calculations_df.columns if col.startswith("pctcov_")]
+    values = calculations_df[pct_cols].to_numpy(dtype=float)
+    assert len(long_df) == np.count_nonzero((values != 0) & ~np.isnan(values))
+    assert (long_df["pctcov"] > 0).all()
+    assert list(long_df["zone"].cat.categories) == ["whole", "dune", "veg", "backdune"]
+
+    # Codetype cover over the whole transect (the "_transect" columns) is zone "whole"
+    s1_a = long_df[long_df["transect"] == "S1_2024-01-01_A"].astype({"zone": str, "category": str})
+    s1_a = s1_a.set_index(["zone", "category"])["pctcov"]
+    assert s1_a[("whole", "TerrestrialPlant")] == pytest.approx(4 / 40)
+    assert s1_a[("whole", "ABC")] == pytest.approx(2 / 40)
+    assert s1_a[("backdune", "all")] == pytest.approx(2 / 4)
+    # ABC isn't in S1 A's dune: zero cover leaves no row
+    assert ("dune", "ABC") not in s1_a.index
+
+    # S1 B has no back dune: its NaN back dune cover leaves no rows either
+    s1_b = long_df[long_df["transect"] == "S1_2024-01-01_B"]
+    assert not (s1_b["zone"] == "backdune").any()
+    assert s1_b["sitename"].eq("S1").all()
@@ -0,0 +1,253 @@
+"""Regression tests pinning the percent cover engine to the output of the
+original merge-per-column code.
+
+The expected tables are frozen: they were produced by the original app's
+merge loops on these sheets and checked by hand, so any change to column
+names, column order or values shows up here.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from sheets import KEYS, back_dune_zones, positional, readme, transects
+from transect_processing import compute_percent_cover, prepare_transects, process_sheets, transect_lengths
+from validation import ValidationError
+
+
+def expected_table(codetypes, species, zones, cover, lengths=None):
+    """The calculations_df layout with the given categories: `cover` maps
+    pctcov columns to their values per transect, every other pctcov column
+    is zero cover (or NaN on transects where the zone has no length)."""
+    table = {
+        "transect": KEYS,
+        "sitename": ["S1", "S1", "S2", "S2"],
+        "date": pd.to_datetime(["2024-01-01", "2024-01-01", "2024-02-01", "2024-02-01"]),
+        "tran_length": [40.0, 35.0, 50.0, 45.0],
+        "dune_length": [10.0, 10.0, 10.0, 10.0],
+        "veg_length": [20.0, 18.0, 25.0, 30.0],
+    }
+    table.update(lengths or {})
+    zone_length = {"whole": "tran_length", "transect": "tran_length", "dune": "dune_length", "veg": "veg_length"}
+    columns = [f"pctcov_all_{zone}" for zone in zones]
+    for zone in zones:
+        suffix = "transect" if zone == "whole" else zone
+        columns += [f"pctcov_{codetype}_{suffix}" for codetype in codetypes]
+        columns += [f"pctcov_TerrestrialPlantNative_{suffix}", f"pctcov_TerrestrialPlantNonnative_{suffix}"]
+    columns += [f"pctcov_{name}_{zone}" for name in species for zone in zones]
+    for col in columns:
+        zone = col.rpartition("_")[2]
+        length = np.asarray(table[zone_length.get(zone, f"{zone}_length")], dtype=float)
+        table[col] = cover.pop(col, np.where(np.isnan(length), np.nan, 0.0))
+    assert not cover, f"unexpected columns {sorted(cover)}"
+    return pd.DataFrame(table)
+
+
+def assert_same_table(result, expected):
+    assert list(result.columns) == list(expected.columns)
+    pd.testing.assert_frame_equal(
+        result.reset_index(drop=True), expected, check_dtype=False, check_categorical=False, rtol=1e-12,
+    )
+
+
+def test_dirty_sheets_match_original_output():
+    positional_df, transects_df = prepare_transects(positional(), transects(dirty=True), readme())
+    result = compute_percent_cover(transects_df, transect_lengths(positional_df))
+
+    expected = expected_table(
+        ["TerrestrialPlant", "Wrack", "DeadTerrestrialPlant", "Unknown", "BareGround"],
+        ["ABC", "DEF", "WR", "ABC-D", "GHI", "BG", "QQQ"],
+        ["whole", "dune", "veg"],
+        {
+            "pctcov_all_whole": [4 / 40, 6 / 35, 5.5 / 50, 2 / 45],
+            "pctcov_all_dune": [2 / 10, 6 / 10, 5.5 / 10, 2 / 10],
+            "pctcov_all_veg": [4 / 20, 6 / 18, 5.5 / 25, 2 / 30],
+            "pctcov_TerrestrialPlant_transect": [4 / 40, 0, 4 / 50, 0],
+            "pctcov_Wrack_transect": [0, 3 / 35, 0, 0],
+            "pctcov_DeadTerrestrialPlant_transect": [0, 3 / 35, 0, 0],
+            "pctcov_Unknown_transect": [0, 0, 1.5 / 50, 0],
+            "pctcov_BareGround_transect": [0, 0, 0, 2 / 45],
+            "pctcov_TerrestrialPlantNative_transect": [2 / 40, 0, 0, 0],
+            "pctcov_TerrestrialPlantNonnative_transect": [2 / 40, 0, 0, 0],
+            "pctcov_TerrestrialPlant_dune": [2 / 10, 0, 4 / 10, 0],
+            "pctcov_Wrack_dune": [0, 3 / 10, 0, 0],
+            "pctcov_DeadTerrestrialPlant_dune": [0, 3 / 10, 0, 0],
+            "pctcov_Unknown_dune": [0, 0, 1.5 / 10, 0],
+            "pctcov_BareGround_dune": [0, 0, 0, 2 / 10],
+            "pctcov_TerrestrialPlantNonnative_dune": [2 / 10, 0, 0, 0],
+            "pctcov_TerrestrialPlant_veg": [4 / 20, 0, 4 / 25, 0],
+            "pctcov_Wrack_veg": [0, 3 / 18, 0, 0],
+            "pctcov_DeadTerrestrialPlant_veg": [0, 3 / 18, 0, 0],
+            "pctcov_Unknown_veg": [0, 0, 1.5 / 25, 0],
+            "pctcov_BareGround_veg": [0, 0, 0, 2 / 30],
+            "pctcov_TerrestrialPlantNative_veg": [2 / 20, 0, 0, 0],
+            "pctcov_TerrestrialPlantNonnative_veg": [2 / 20, 0, 0, 0],
+            "pctcov_ABC_whole": [2 / 40, 0, 0, 0],
+            "pctcov_ABC_veg": [2 / 20, 0, 0, 0],
+            "pctcov_DEF_whole": [2 / 40, 0, 0, 0],
+            "pctcov_DEF_dune": [2 / 10, 0, 0, 0],
+            "pctcov_DEF_veg": [2 / 20, 0, 0, 0],
+            "pctcov_WR_whole": [0, 3 / 35, 0, 0],
+            "pctcov_WR_dune": [0, 3 / 10, 0, 0],
+            "pctcov_WR_veg": [0, 3 / 18, 0, 0],
+            "pctcov_ABC-D_whole": [0, 3 / 35, 0, 0],
+            "pctcov_ABC-D_dune": [0, 3 / 10, 0, 0],
+            "pctcov_ABC-D_veg": [0, 3 / 18, 0, 0],
+            "pctcov_GHI_whole": [0, 0, 4 / 50, 0],
+            "pctcov_GHI_dune": [0, 0, 4 / 10, 0],
+            "pctcov_GHI_veg": [0, 0, 4 / 25, 0],
+            "pctcov_BG_whole": [0, 0, 0, 2 / 45],
+            "pctcov_BG_dune": [0, 0, 0, 2 / 10],
+            "pctcov_BG_veg": [0, 0, 0, 2 / 30],
+        },
+    )
+    assert_same_table(result, expected)
+
+
+def test_process_sheets_rejects_dirty_sheets():
+    with pytest.raises(ValidationError) as excinfo:
+        process_sheets(positional(), transects(dirty=True), readme())
+    assert set(excinfo.value.errors["check"]) == {
+        "missing type", "type not in ReadMe", "missing cor_length", "transect not in PositionalCharacteristics",
+    }
+
+
+
+def test_process_sheets_rejects_text_positions_and_duplicate_names():
+    positional_df = positional().astype({"toe_in": object})
+    positional_df.loc[1, "toe_in"] = "4m"
+    positional_df.loc[2, "lowest_veg"] = np.nan
+    transects_df = transects().astype({"start": object})
+    transects_df.loc[3, "start"] = "13,5"
+    readme_df = pd.concat([readme(), readme().iloc[[1]].assign(name=" DEF")], ignore_index=True)
+
+    with pytest.raises(ValidationError) as excinfo:
+        process_sheets(positional_df, transects_df, readme_df)
+    errors = excinfo.value.errors
+    assert list(zip(errors["sheet"], errors["row"], errors["check"])) == [
+        ("PositionalCharacteristics", 3, "toe_in not a number"),
+        ("PositionalCharacteristics", 4, "missing lowest_veg"),
+        ("Transects", 5, "start not a number"),
+        ("ReadMe", 3, "duplicate ReadMe name"),
+        ("ReadMe", 8, "duplicate ReadMe name"),
+    ]
+    assert errors["detail"].tolist()[:3] == ["S1_2024-01-01_B: 4m", "S2_2024-02-01_A", "start 13,5"]
+
+
+# Shared by both zone methods: cover over the whole and vegetated transect
+# doesn't depend on how the dune is assigned
+WHOLE_AND_VEG = {
+    "pctcov_all_whole": [4 / 40, 6 / 35, 5.5 / 50, 2 / 45],
+    "pctcov_all_veg": [4 / 20, 6 / 18, 5.5 / 25, 2 / 30],
+    "pctcov_TerrestrialPlant_transect": [4 / 40, 0, 4 / 50, 0],
+    "pctcov_Wrack_transect": [0, 3 / 35, 0, 0],
+    "pctcov_DeadTerrestrialPlant_transect": [0, 3 / 35, 0, 0],
+    "pctcov_BareGround_transect": [0, 0, 1.5 / 50, 2 / 45],
+    "pctcov_TerrestrialPlantNative_transect": [2 / 40, 0, 0, 0],
+    "pctcov_TerrestrialPlantNonnative_transect": [2 / 40, 0, 0, 0],
+    "pctcov_TerrestrialPlant_veg": [4 / 20, 0, 4 / 25, 0],
+    "pctcov_Wrack_veg": [0, 3 / 18, 0, 0],
+    "pctcov_DeadTerrestrialPlant_veg": [0, 3 / 18, 0, 0],
+    "pctcov_BareGround_veg": [0, 0, 1.5 / 25, 2 / 30],
+    "pctcov_TerrestrialPlantNative_veg": [2 / 20, 0, 0, 0],
+    "pctcov_TerrestrialPlantNonnative_veg": [2 / 20, 0, 0, 0],
+    "pctcov_ABC_whole": [2 / 40, 0, 0, 0],
+    "pctcov_ABC_veg": [2 / 20, 0, 0, 0],
+    "pctcov_DEF_whole": [2 / 40, 0, 0, 0],
+    "pctcov_DEF_veg": [2 / 20, 0, 0, 0],
+    "pctcov_WR_whole": [0, 3 / 35, 0, 0],
+    "pctcov_WR_veg": [0, 3 / 18, 0, 0],
+    "pctcov_ABC-D_whole": [0, 3 / 35, 0, 0],
+    "pctcov_ABC-D_veg": [0, 3 / 18, 0, 0],
+    "pctcov_GHI_whole": [0, 0, 4 / 50, 0],
+    "pctcov_GHI_veg": [0, 0, 4 / 25, 0],
+    "pctcov_BG_whole": [0, 0, 1.5 / 50, 2 / 45],
+    "pctcov_BG_veg": [0, 0, 1.5 / 25, 2 / 30],
+}
+CODETYPES = ["TerrestrialPlant", "Wrack", "DeadTerrestrialPlant", "BareGround"]
+SPECIES = ["ABC", "DEF", "WR", "ABC-D", "GHI", "BG"]
+
+
+def test_process_sheets_endpoint_flags():
+    result = process_sheets(positional(), transects(), readme(), "flags")
+
+    # An intercept counts fully in the dune if either end is between the toes
+    expected = expected_table(CODETYPES, SPECIES, ["whole", "dune", "veg"], {
+        **WHOLE_AND_VEG,
+        "pctcov_all_dune": [2 / 10, 6 / 10, 5.5 / 10, 2 / 10],
+        "pctcov_TerrestrialPlant_dune": [2 / 10, 0, 4 / 10, 0],
+        "pctcov_Wrack_dune": [0, 3 / 10, 0, 0],
+        "pctcov_DeadTerrestrialPlant_dune": [0, 3 / 10, 0, 0],
+        "pctcov_BareGround_dune": [0, 0, 1.5 / 10, 2 / 10],
+        "pctcov_TerrestrialPlantNonnative_dune": [2 / 10, 0, 0, 0],
+        "pctcov_DEF_dune": [2 / 10, 0, 0, 0],
+        "pctcov_WR_dune": [0, 3 / 10, 0, 0],
+        "pctcov_ABC-D_dune": [0, 3 / 10, 0, 0],
+        "pctcov_GHI_dune": [0, 0, 4 / 10, 0],
+        "pctcov_BG_dune": [0, 0, 1.5 / 10, 2 / 10],
+    })
+    assert_same_table(result, expected)
+
+
+def test_process_sheets_exact_overlap_with_user_zone():
+    result = process_sheets(positional(), transects(), readme(), "overlap", back_dune_zones())
+
+    # Only the part of each intercept inside a zone counts: WR (2-5) and
+    # ABC-D (13-16) each have a third of their length in S1 B's dune (4-14),
+    # BG (1-3) only touches S2 C's dune (3-13). The back dune is only
+    # defined on the two A transects.
+    expected = expected_table(CODETYPES, SPECIES, ["whole", "dune", "veg", "backdune"], {
+        **WHOLE_AND_VEG,
+        "pctcov_all_dune": [2 / 10, 2 / 10, 2.5 / 10, 0],
+        "pctcov_TerrestrialPlant_dune": [2 / 10, 0, 2 / 10, 0],
+        "pctcov_Wrack_dune": [0, 1 / 10, 0, 0],
+        "pctcov_DeadTerrestrialPlant_dune": [0, 1 / 10, 0, 0],
+        "pctcov_BareGround_dune": [0, 0, 0.5 / 10, 0],
+        "pctcov_TerrestrialPlantNonnative_dune": [2 / 10, 0, 0, 0],
+        "pctcov_DEF_dune": [2 / 10, 0, 0, 0],
+        "pctcov_WR_dune": [0, 1 / 10, 0, 0],
+        "pctcov_ABC-D_dune": [0, 1 / 10, 0, 0],
+        "pctcov_GHI_dune": [0, 0, 2 / 10, 0],
+        "pctcov_BG_dune": [0, 0, 0.5 / 10, 0],
+        "pctcov_all_backdune": [2 / 4, np.nan, 3 / 5, np.nan],
+        "pctcov_TerrestrialPlant_backdune": [2 / 4, np.nan, 3 / 5, np.nan],
+        "pctcov_TerrestrialPlantNative_backdune": [2 / 4, np.nan, 0, np.nan],
+        "pctcov_ABC_backdune": [2 / 4, np.nan, 0, np.nan],
+        "pctcov_GHI_backdune": [0, np.nan, 3 / 5, np.nan],
+    }, lengths={"backdune_length": [4.0, np.nan, 5.0, np.nan]})
+    assert_same_table(result, expected)
+
+
+def test_overlapping_zone_intervals_count_once():
+    # S1 A's back dune given as [0, 2] + [1, 4] (in reverse) + [2, 3] is
+    # the same zone as [0, 4]
+    zones_sheet = pd.concat([back_dune_zones()] * 3, ignore_index=True)
+    zones_sheet.loc[[0, 2, 4], ["zone_start", "zone_end"]] = [[0.0, 2.0], [4.0, 1.0], [2.0, 3.0]]
+    result = process_sheets(positional(), transects(), readme(), "overlap", zones_sheet)
+
+    expected = process_sheets(positional(), transects(), readme(), "overlap", back_dune_zones())
+    assert_same_table(result, expected)
+    assert result.loc[0, "backdune_length"] == 4.0
+    assert result.loc[0, "pctcov_all_backdune"] == pytest.approx(2 / 4)
+
+
+def test_process_sheets_rejects_bad_zones_sheet():
+    zones_sheet = pd.DataFrame({
+        "sitename": ["S1", "S1", "S2", "S1"],
+        "date": pd.to_datetime(["2024-01-01", "2024-01-01", "2024-02-01", "2024-01-01"]),
+        "transect": ["A", "Z", "A", "B"],
+        "zone": ["back dune", "back dune", " ", "all"],
+        "zone_start": [0.0, 0.0, 15.0, np.nan],
+        "zone_end": [4.0, 4.0, 20.0, 3.0],
+    })
+    with pytest.raises(ValidationError) as excinfo:
+        process_sheets(positional(), transects(), readme(), "overlap", zones_sheet)
+    errors = excinfo.value.errors
+    assert list(zip(errors["row"], errors["check"])) == [
+        (3, "transect not in PositionalCharacteristics"),
+        (4, "missing zone"),
+        (5, "reserved zone name"),
+        (5, "missing zone_start"),
+    ]
+
+    # The Zones sheet isn't used with endpoint flags, so it isn't checked
+    process_sheets(positional(), transects(), readme(), "flags", zones_sheet)
@@ -0,0 +1,93 @@
+import pandas as pd
+import pytest
+
+from batch_processing import combine_results
+from results_store import ResultsStore
+from sheets import back_dune_zones, positional, readme, separate_workbooks, transects
+from transect_processing import process_sheets
+
+
+def calculations(zone_method="flags"):
+    zones_sheet = back_dune_zones() if zone_method == "overlap" else None
+    return process_sheets(positional(), transects(), readme(), zone_method, zones_sheet)
+
+
+@pytest.fixture
+def store(tmp_path):
+    with ResultsStore(tmp_path / "results.sqlite") as store:
+        yield store
+
+
+def assert_same_table(result, expected):
+    # Columns come back in the order they were first stored
+    pd.testing.assert_frame_equal(result[expected.columns], expected, check_dtype=False)
+
+
+@pytest.mark.parametrize("zone_method", ["flags", "overlap"])
+def test_sparse_round_trip(store, zone_method):
+    calculations_df = calculations(zone_method)
+    assert store.upsert(calculations_df, zone_method) == len(calculations_df)
+    assert_same_table(store.load(zone_method=zone_method), calculations_df)
+
+
+def test_upsert_replaces_a_transect(store):
+    calculations_df = calculations()
+    store.upsert(calculations_df)
+
+    # Re-upload S1 A with all of its ABC cover gone
+    changed = calculations_df.iloc[[0]].copy()
+    abc_cols = [col for col in changed.columns if col.startswith("pctcov_ABC_")]
+    changed[abc_cols] = 0.0
+    changed["pctcov_all_whole"] = 0.5
+    store.upsert(changed)
+
+    expected = calculations_df.copy()
+    expected.loc[0, abc_cols] = 0.0
+    expected.loc[0, "pctcov_all_whole"] = 0.5
+    result = store.load()
+    assert len(result) == len(calculations_df)
+    assert_same_table(result, expected)
+    assert store.surveys()["transects"].tolist() == [2, 2]
+
+
+def test_zone_methods_are_kept_apart(store):
+    flags_df, overlap_df = calculations("flags"), calculations("overlap")
+    store.upsert(flags_df, "flags")
+    store.upsert(overlap_df, "overlap")
+
+    assert_same_table(store.load(zone_method="flags"), flags_df)
+    assert_same_table(store.load(zone_method="overlap"), overlap_df)
+    # Only the overlap results have a back dune
+    assert "pctcov_all_backdune" not in store.load(zone_method="flags")
+    assert store.surveys()["zone_method"].tolist() == ["flags", "flags", "overlap", "overlap"]
+
+    with pytest.raises(ValueError, match="Unknown zone method"):
+        store.upsert(flags_df, "bands")
+
+
+def test_site_and_date_filters(store):
+    store.upsert(calculations())
+
+    assert set(store.load(sitenames=["S2"])["sitename"]) == {"S2"}
+    assert store.load(sitenames=[]).empty
+    # The range is inclusive of whole days, whatever the time on the bounds
+    assert set(store.load(end="2024-01-01")["sitename"]) == {"S1"}
+    assert set(store.load(start=pd.Timestamp("2024-02-01 12:00"))["sitename"]) == {"S2"}
+    assert len(store.load(start="2024-01-01", end="2024-02-01")) == 4
+    assert store.load(start="2024-01-02", end="2024-01-31").empty
+    assert store.load(sitenames=["S1"], start="2024-02-01").empty
+
+
+def test_zone_one_survey_lacks_stays_nan(store):
+    s1_df, s2_df = separate_workbooks()
+    store.upsert(s1_df, "overlap")
+    store.upsert(s2_df, "overlap")
+
+    # S2 has no back dune, so its back dune cover is NaN like combine_results
+    # gives, while species it didn't record are still zero
+    result = store.load(zone_method="overlap")
+    expected = combine_results([s1_df, s2_df])
+    assert_same_table(result, expected)
+    assert result.loc[result["sitename"] == "S2", "pctcov_all_backdune"].isna().all()
+    assert (result.loc[result["sitename"] == "S2", "pctcov_ABC_dune"] == 0).all()
+    assert "pctcov_all_backdune" not in store.load(sitenames=["S2"], zone_method="overlap")
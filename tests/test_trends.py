@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from trends import cover_stats, survey_changes
+
+
+def calculations():
+    # Two surveys of S1 and one of S2; S2's second transect has no dune
+    return pd.DataFrame({
+        "transect": ["S1_a_A", "S1_a_B", "S1_a_C", "S1_b_A", "S1_b_B", "S2_a_A", "S2_a_B"],
+        "sitename": ["S1", "S1", "S1", "S1", "S1", "S2", "S2"],
+        "date": pd.to_datetime(["2023-05-01"] * 3 + ["2024-05-01"] * 2 + ["2023-06-01"] * 2),
+        "pctcov_all_whole": [0.2, 0.4, 0.3, 0.5, 0.7, 0.1, 0.0],
+        "pctcov_all_dune": [0.6, 0.2, 0.1, 0.9, 0.5, 0.4, np.nan],
+        "pctcov_Wrack_transect": [0.1, 0.0, 0.0, 0.2, 0.2, 0.0, 0.05],
+    })
+
+
+def test_cover_stats_match_a_plain_groupby():
+    calculations_df = calculations()
+    stats = cover_stats(calculations_df, n_boot=200)
+
+    expected = (
+        calculations_df.melt(["transect", "sitename", "date"], var_name="column", value_name="pctcov")
+        .groupby(["sitename", "date", "column"])["pctcov"].agg(["mean", "std", "count"])
+    )
+    column = {("whole", "all"): "pctcov_all_whole", ("dune", "all"): "pctcov_all_dune", ("whole", "Wrack"): "pctcov_Wrack_transect"}
+    assert len(stats) == len(expected)
+    for row in stats.itertuples():
+        mean, sd, count = expected.loc[(row.sitename, row.date, column[(row.zone, row.category)])]
+        assert row.mean == pytest.approx(mean)
+        assert row.n_transects == count
+        assert (np.isnan(row.sd) and np.isnan(sd)) or row.sd == pytest.approx(sd)
+        if count >= 2:
+            assert row.ci_low <= row.mean <= row.ci_high
+        else:
+            assert np.isnan(row.ci_low) and np.isnan(row.ci_high)
+
+    # S2's dune without a length is left out rather than counted as zero
+    s2_dune = stats[(stats["sitename"] == "S2") & (stats["zone"] == "dune")]
+    assert s2_dune["n_transects"].tolist() == [1]
+    assert s2_dune["mean"].tolist() == [pytest.approx(0.4)]
+
+
+def test_cover_stats_are_repeatable_and_can_skip_the_bootstrap():
+    calculations_df = calculations()
+    pd.testing.assert_frame_equal(cover_stats(calculations_df, n_boot=100), cover_stats(calculations_df, n_boot=100))
+    assert cover_stats(calculations_df, n_boot=0)["ci_low"].isna().all()
+
+
+def test_cover_stats_by_year():
+    stats = cover_stats(calculations(), by=["year"], n_boot=0)
+    whole = stats[(stats["zone"] == "whole") & (stats["category"] == "all")].set_index("year")
+    assert whole.loc[2023, "n_transects"] == 5
+    assert whole.loc[2023, "mean"] == pytest.approx(np.mean([0.2, 0.4, 0.3, 0.1, 0.0]))
+    assert whole.loc[2024, "mean"] == pytest.approx(0.6)
+
+
+def test_survey_changes_compare_each_survey_to_the_previous_one():
+    changes = survey_changes(cover_stats(calculations(), n_boot=0))
+
+    # Only S1 was surveyed twice
+    assert set(changes["sitename"]) == {"S1"}
+    whole = changes[(changes["zone"] == "whole") & (changes["category"] == "all")].iloc[0]
+    assert whole["previous_date"] == pd.Timestamp("2023-05-01")
+    assert whole["date"] == pd.Timestamp("2024-05-01")
+    assert whole["previous_mean"] == pytest.approx(0.3)
+    assert whole["change"] == pytest.approx(0.6 - 0.3)
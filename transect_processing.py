@@ -0,0 +1,292 @@
+import pandas as pd
+import numpy as np
+
+from instrumentation import StageTimer
+from validation import ValidationError, validate_sheets
+from zones import apportion, combine_zones, default_zones, user_zones, zone_length_column, zone_lengths
+
+
+# How intercepts are assigned to the dune/veg zones:
+#   flags   - the whole cor_length counts if the start or end lies in the dune,
+#             or if the start is on the vegetated side of lowest_veg (original method)
+#   overlap - each intercept is clipped to each zone and its cor_length
+#             apportioned by the overlapping fraction; supports a "Zones" sheet
+ZONE_METHODS = ("flags", "overlap")
+
+# Codetype/native columns over the whole transect are suffixed "_transect"
+# while everything else uses the zone name
+CODETYPE_SUFFIXES = {
+    "whole": "transect",
+}
+
+
+def _take(values, codes, missing):
+    """values[codes], with `missing` wherever a code is -1."""
+    return np.append(np.asarray(values, dtype=object if isinstance(missing, str) else None), missing)[codes]
+
+
+def _stripped_categorical(values):
+    """values as a Categorical with leading/trailing spaces stripped.
+
+    Only the distinct values are stripped (like Series.str.strip, anything
+    that isn't a string becomes NaN); values that become equal are merged.
+    """
+    values = pd.Categorical(values)
+    stripped = pd.Series(values.categories).str.strip()
+    codes, uniques = pd.factorize(stripped)
+    return pd.Categorical.from_codes(_take(codes, values.codes, -1), uniques)
+
+
+def _key_positions(positional_keys, keys):
+    """Row position in positional_keys of each of `keys`, or -1 if it isn't
+    there. A key listed twice (which validation rejects) resolves to its
+    first row."""
+    positions = pd.Series(np.arange(len(positional_keys)), index=pd.Index(positional_keys))
+    positions = positions[positions.index.notna() & ~positions.index.duplicated()]
+    return positions.reindex(pd.Index(keys)).fillna(-1).to_numpy(dtype=np.int64)
+
+
+def transect_ids(df, positional_keys):
+    """The row of PositionalCharacteristics (as an integer position) that each
+    row of df belongs to, matched on its sitename_date_transect key; -1 if
+    none.
+
+    The rows are grouped on their (sitename, date, transect) columns first,
+    so the key strings are only built once per transect rather than once per
+    intercept.
+    """
+    if not len(df):
+        return np.zeros(0, dtype=np.int64)
+    grouped = df.groupby(["sitename", "date", "transect"], sort=False, observed=True, dropna=False)
+    codes = grouped.ngroup().to_numpy(dtype=np.int64)
+    unique = grouped.size().index.to_frame(index=False).astype({"sitename": object, "transect": object})
+    unique_keys = unique["sitename"] + "_" + unique["date"].astype(str) + "_" + unique["transect"]
+    return _key_positions(positional_keys, unique_keys)[codes]
+
+
+def prepare_transects(positional_df, transects_df, readme_df):
+    """Clean the uploaded sheets and tag every intercept with its codetype,
+    native status and whether it falls in the dune / vegetated zones.
+
+    positional_df gets the sitename_date_transect key in "transect" and its
+    own row position in "transect_id" (-1 for a blank key or a repeated
+    one). transects_df gets the position of its transect's row in
+    "transect_id" (-1 if it has none) instead of a key string, and type and
+    codetype as categoricals, so grouping intercepts by transect, species
+    or codetype works on integer codes.
+
+    Returns copies of (positional_df, transects_df); the inputs are untouched.
+    """
+    positional_df = positional_df.copy()
+    transects_df = transects_df.copy()
+    readme_df = readme_df.copy()
+
+    # Strip leading/trailing spaces to ensure clean matching
+    types = _stripped_categorical(transects_df["type"])
+    transects_df["type"] = types
+    readme_df["name"] = readme_df["name"].str.strip()
+
+    #amend the transects column to have more specific data so there are no duplicate values
+    positional_df["transect"] = positional_df["sitename"] + "_" + positional_df["date"].astype(str) + "_" + positional_df["transect"]
+    own_position = _key_positions(positional_df["transect"], positional_df["transect"])
+    positional_df["transect_id"] = np.where(own_position == np.arange(len(positional_df)), own_position, -1)
+    transects_df["transect_id"] = transect_ids(transects_df, positional_df["transect"])
+
+    # Add 'native' and 'codetype' columns to transects_df based on 'type' matching 'name'.
+    # Each distinct type is looked up once and the rows take its result by code.
+    readme_by_name = readme_df.set_index("name")
+    type_names = pd.Index(types.categories)
+    native_by_type = type_names.map(readme_by_name["native"])
+    # The extra last entry stands for a blank type (code -1)
+    codetype_by_type = pd.Series(list(type_names.map(readme_by_name["codetype"])) + [np.nan], dtype=object)
+    # Fill missing 'codetype' values with "Dead Terrestrial Plant" if 'type' contains "-D"
+    codetype_by_type[np.append(type_names.str.contains("-D", na=False), False)] = "Dead Terrestrial Plant"
+    # Convert codetype to string and replace NaN values with "Unknown"
+    codetype_by_type = codetype_by_type.astype(str).fillna("Unknown")
+    native_codes, natives = pd.factorize(native_by_type)
+    transects_df["native"] = pd.Categorical.from_codes(_take(native_codes, types.codes, -1), natives)
+    codetype_codes, codetypes = pd.factorize(codetype_by_type)
+    transects_df["codetype"] = pd.Categorical.from_codes(codetype_codes[types.codes], codetypes)
+
+    # Map the positional values (toe_sea, toe_in, lowest_veg) to transects_df
+    positional_values = positional_df[["toe_sea", "toe_in", "lowest_veg"]].to_numpy(dtype=float)
+    positional_values = np.vstack([positional_values, np.full((1, 3), np.nan)])[transects_df["transect_id"].to_numpy()]
+    for i, column in enumerate(["toe_sea", "toe_in", "lowest_veg"]):
+        transects_df[column] = positional_values[:, i]
+
+    # The row is in the dune if it starts or ends between the two toes
+    start_within_dune = (transects_df["start"] <= transects_df["toe_sea"]) & (transects_df["start"] >= transects_df["toe_in"])
+    end_within_dune = (transects_df["end"] >= transects_df["toe_in"]) & (transects_df["end"] <= transects_df["toe_sea"])
+    transects_df["dune"] = start_within_dune | end_within_dune
+
+    # Identify if the row is within the vegetated portion of the dune
+    transects_df["veg"] = transects_df["start"] <= transects_df["lowest_veg"]
+
+    return positional_df, transects_df
+
+
+def transect_lengths(positional_df):
+    """One row per transect with the lengths used as percent cover denominators."""
+    calculations_df = pd.DataFrame()
+    calculations_df["transect"] = positional_df["transect"]
+    calculations_df["sitename"] = positional_df["sitename"]
+    calculations_df["date"] = positional_df["date"]
+    # transect length
+    calculations_df["tran_length"] = (positional_df["HTS"] - positional_df["eastend"]).abs()
+    # dune length
+    calculations_df["dune_length"] = positional_df["toe_sea"] - positional_df["toe_in"].abs()
+    # vegeted length
+    calculations_df["veg_length"] = (positional_df["lowest_veg"] - positional_df["eastend"]).abs()
+    return calculations_df
+
+
+def _summed_cover(rows, key, value_col, transects, categories):
+    """Sum value_col for every (transect, category) pair in one groupby and
+    lay it out as a transect x category matrix aligned to `transects` (the
+    transect_id of each row)."""
+    sums = rows.groupby(["transect_id", key], sort=False, observed=True)[value_col].sum()
+    if sums.empty:
+        return np.zeros((len(transects), len(categories)))
+    sums = sums.unstack(key).reindex(index=transects, columns=categories)
+    return sums.fillna(0).to_numpy(dtype=float)
+
+
+def flag_zones(transects_df):
+    """Zone spec for the original dune/veg flags: the whole cor_length of a
+    flagged intercept counts toward the zone. Returns (transects_df, zones)."""
+    transects_df = transects_df.assign(
+        cor_length_dune=transects_df["cor_length"].where(transects_df["dune"] == True),
+        cor_length_veg=transects_df["cor_length"].where(transects_df["veg"] == True),
+    )
+    zones = {
+        "whole": ("cor_length", "tran_length"),
+        "dune": ("cor_length_dune", "dune_length"),
+        "veg": ("cor_length_veg", "veg_length"),
+    }
+    return transects_df, zones
+
+
+def compute_percent_cover(transects_df, calculations_df, zones=None):
+    """Add every pctcov_* column to calculations_df.
+
+    transects_df must already be annotated by prepare_transects, and
+    calculations_df built by transect_lengths from its positional_df, so
+    row i of calculations_df is transect_id i. `zones` maps
+    each zone to (column of transects_df holding each intercept's length in
+    that zone, column of calculations_df holding the zone length); intercepts
+    outside a zone are NaN or 0. It defaults to the original whole/dune/veg
+    flags (flag_zones).
+
+    Each zone is aggregated with a fixed number of groupbys (all cover,
+    codetype, native, species) whatever the number of species, and divided by
+    its length column in one shot. Column names and order match the original
+    per-species merge loops.
+    """
+    if zones is None:
+        transects_df, zones = flag_zones(transects_df)
+    transects = pd.RangeIndex(len(calculations_df))
+    unique_codetypes = list(transects_df["codetype"].unique())
+    unique_species = list(transects_df["type"].dropna().unique())
+
+    # Native / nonnative only applies to terrestrial plants
+    terrestrial = (transects_df["codetype"] == "Terrestrial Plant").to_numpy()
+    native_codes = np.full(len(transects_df), -1, dtype=np.int8)
+    native_codes[terrestrial & (transects_df["native"] == 1.0).to_numpy()] = 0
+    native_codes[terrestrial & (transects_df["native"] == 0.0).to_numpy()] = 1
+    transects_df = transects_df.assign(native_status=pd.Categorical.from_codes(native_codes, ["Native", "Nonnative"]))
+
+    all_cover = {}
+    codetype_cover = {}
+    species_cover = {}
+    for zone, (value_col, length_col) in zones.items():
+        length = calculations_df[length_col].to_numpy()[:, None]
+
+        # Everything; transects with no intercepts at all stay NaN over the whole transect
+        total = transects_df.groupby("transect_id")[value_col].sum().reindex(transects)
+        if zone != "whole":
+            total = total.fillna(0)
+        all_cover[zone] = total.to_numpy()[:, None] / length
+
+        codetype_cover[zone] = (
+            _summed_cover(transects_df, "codetype", value_col, transects, unique_codetypes) / length,
+            _summed_cover(transects_df, "native_status", value_col, transects, ["Native", "Nonnative"]) / length,
+        )
+        species_cover[zone] = _summed_cover(transects_df, "type", value_col, transects, unique_species) / length
+
+    # Assemble in the original column order. Assigning into a dict keeps the
+    # first position and last value when two cleaned names collide, the same
+    # as repeated calculations_df[col] = ... assignments did.
+    columns = {}
+    for zone in zones:
+        columns[f"pctcov_all_{zone}"] = all_cover[zone][:, 0]
+    for zone in zones:
+        suffix = CODETYPE_SUFFIXES.get(zone, zone)
+        by_codetype, by_native = codetype_cover[zone]
+        for i, codetype in enumerate(unique_codetypes):
+            columns[f"pctcov_{codetype.replace(' ', '')}_{suffix}"] = by_codetype[:, i]
+        columns[f"pctcov_TerrestrialPlantNative_{suffix}"] = by_native[:, 0]
+        columns[f"pctcov_TerrestrialPlantNonnative_{suffix}"] = by_native[:, 1]
+    for i, species in enumerate(unique_species):
+        for zone in zones:
+            columns[f"pctcov_{species.replace(' ', '')}_{zone}"] = species_cover[zone][:, i]
+
+    cover_df = pd.DataFrame(columns, index=calculations_df.index)
+    return pd.concat([calculations_df, cover_df], axis=1)
+
+
+def overlap_zones(transects_df, positional_df, calculations_df, zones_sheet=None):
+    """Zone spec for exact interval overlap (see zones.apportion).
+
+    Adds a cor_length_<zone> column to transects_df for each zone and sets
+    each zone's length column in calculations_df to the summed length of
+    its intervals. User zones come from the optional "Zones" sheet.
+    Returns (transects_df, calculations_df, zones).
+    """
+    extra = None
+    if zones_sheet is not None and not zones_sheet.empty:
+        extra = user_zones(zones_sheet, transect_ids(zones_sheet, positional_df["transect"]))
+    zone_table = combine_zones(default_zones(positional_df), extra)
+    apportioned = apportion(transects_df, zone_table)
+    lengths = zone_lengths(zone_table, pd.RangeIndex(len(calculations_df)))
+
+    transects_df = transects_df.copy()
+    calculations_df = calculations_df.copy()
+    zones = {}
+    for zone in apportioned.columns:
+        value_col = f"cor_length_{zone}"
+        length_col = zone_length_column(zone)
+        transects_df[value_col] = apportioned[zone]
+        calculations_df[length_col] = lengths[zone].to_numpy()
+        zones[zone] = (value_col, length_col)
+    return transects_df, calculations_df, zones
+
+
+def process_sheets(positional_df, transects_df, readme_df, zone_method="flags", zones_sheet=None, timer=None):
+    """Run the full percent cover pipeline on the uploaded sheets.
+
+    zone_method is one of ZONE_METHODS; zones_sheet (the optional "Zones"
+    sheet) is only used with "overlap". Pass an instrumentation.StageTimer
+    as `timer` to record how long each stage takes.
+
+    The sheets are validated first and a validation.ValidationError listing
+    every problem is raised before any aggregation if they fail.
+    """
+    if zone_method not in ZONE_METHODS:
+        raise ValueError(f"Unknown zone method {zone_method!r}; expected one of {', '.join(ZONE_METHODS)}")
+    timer = timer if timer is not None else StageTimer()
+    with timer.stage("validate", rows=len(transects_df)):
+        # The Zones sheet is only used, and so only checked, with "overlap"
+        errors = validate_sheets(positional_df, transects_df, readme_df, zones_sheet if zone_method == "overlap" else None)
+    if not errors.empty:
+        raise ValidationError(errors)
+    with timer.stage("classify", rows=len(transects_df)):
+        positional_df, transects_df = prepare_transects(positional_df, transects_df, readme_df)
+        calculations_df = transect_lengths(positional_df)
+    zones = None
+    if zone_method == "overlap":
+        with timer.stage("zones", rows=len(transects_df)):
+            transects_df, calculations_df, zones = overlap_zones(transects_df, positional_df, calculations_df, zones_sheet)
+    with timer.stage("aggregate") as stage:
+        calculations_df = compute_percent_cover(transects_df, calculations_df, zones)
+        stage["rows"] = len(calculations_df)
+    return calculations_df
@@ -0,0 +1,117 @@
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from exports import pctcov_columns
+
+
+# A survey is one site on one date
+SURVEY_KEYS = ["sitename", "date"]
+
+# Bootstrap resamples per group and the confidence level of the interval
+N_BOOT = 1000
+CI_LEVEL = 0.95
+
+
+def _group_keys(calculations_df, by):
+    """The grouping columns, deriving "year" from the survey date if asked for."""
+    keys = pd.DataFrame(index=calculations_df.index)
+    for key in by:
+        if key == "year" and "year" not in calculations_df.columns:
+            keys["year"] = pd.to_datetime(calculations_df["date"]).dt.year
+        else:
+            keys[key] = calculations_df[key]
+    return keys
+
+
+def _bootstrap_means(values, n_boot, rng):
+    """Means of n_boot resamples (with replacement) of the rows of values,
+    skipping NaN like the plain mean does. Returns an (n_boot, columns) array.
+
+    Each resample is a row of multinomial counts, so all of them are summed
+    with one matrix product instead of materializing the resampled rows.
+    """
+    n = len(values)
+    counts = rng.multinomial(n, np.full(n, 1 / n), size=n_boot).astype(float)
+    present = ~np.isnan(values)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return (counts @ np.where(present, values, 0.0)) / (counts @ present)
+
+
+def cover_stats(calculations_df, by=SURVEY_KEYS, n_boot=N_BOOT, ci=CI_LEVEL, seed=0):
+    """Mean and standard deviation of percent cover across transects, per
+    group x zone x category, with a bootstrap confidence interval.
+
+    `by` lists the grouping columns: the default gives one row per survey
+    (sitename, date); ["sitename"] pools all of a site's surveys and
+    ["year"] summarizes the whole network by year. Transects with undefined
+    cover (NaN, e.g. a zero-length dune) are left out of that zone's
+    statistics; n_transects counts those used. The interval is the
+    percentile interval of n_boot resampled means (NaN with fewer than two
+    transects); pass n_boot=0 to skip it. `seed` makes the resampling, and
+    so cached results, repeatable.
+    """
+    by = list(by)
+    pct_cols, zones, categories, zone_names = pctcov_columns(calculations_df.columns)
+    keys = _group_keys(calculations_df, by)
+    values = calculations_df[pct_cols].to_numpy(dtype=float)
+
+    grouped = pd.DataFrame(values, index=calculations_df.index).groupby([keys[key] for key in by], sort=True)
+    mean = grouped.mean()
+    n_groups = len(mean)
+    sd = grouped.std().to_numpy()
+    count = grouped.count().to_numpy()
+
+    ci_low = np.full((n_groups, len(pct_cols)), np.nan)
+    ci_high = np.full((n_groups, len(pct_cols)), np.nan)
+    if n_boot:
+        rng = np.random.default_rng(seed)
+        tail = (1 - ci) / 2 * 100
+        # Row positions of each group, in the same (sorted) order as `mean`
+        codes = grouped.ngroup().to_numpy()
+        in_group = codes >= 0
+        order = np.flatnonzero(in_group)[np.argsort(codes[in_group], kind="stable")]
+        bounds = np.cumsum(np.bincount(codes[in_group], minlength=n_groups))
+        for position, rows in enumerate(np.split(order, bounds[:-1])):
+            if len(rows) < 2:
+                continue
+            boot = _bootstrap_means(values[rows], n_boot, rng)
+            if not np.isnan(boot).any():
+                ci_low[position], ci_high[position] = np.percentile(boot, [tail, 100 - tail], axis=0)
+                continue
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore", RuntimeWarning)  # columns missing from every resample
+                ci_low[position], ci_high[position] = np.nanpercentile(boot, [tail, 100 - tail], axis=0)
+        ci_low[count < 2] = np.nan
+        ci_high[count < 2] = np.nan
+
+    # One row per group and column, keeping only the ones with any transects
+    group_pos, col_pos = np.nonzero(count > 0)
+    stats = mean.index.to_frame(index=False).iloc[group_pos].reset_index(drop=True)
+    stats["zone"] = pd.Categorical(np.asarray(zones, dtype=object)[col_pos], categories=zone_names)
+    stats["category"] = pd.Categorical(np.asarray(categories, dtype=object)[col_pos])
+    stats["n_transects"] = count[group_pos, col_pos]
+    stats["mean"] = mean.to_numpy()[group_pos, col_pos]
+    stats["sd"] = sd[group_pos, col_pos]
+    stats["ci_low"] = ci_low[group_pos, col_pos]
+    stats["ci_high"] = ci_high[group_pos, col_pos]
+    return stats
+
+
+def survey_changes(stats, within=("sitename",), over="date"):
+    """Change in mean cover from each survey to the previous one.
+
+    `stats` is a cover_stats table grouped by `within` + `over`. Returns its
+    rows that have an earlier survey of the same site, zone and category,
+    with previous_<over>, previous_mean and change (mean - previous_mean,
+    in the units of the pctcov columns).
+    """
+    series = list(within) + ["zone", "category"]
+    changes = stats.sort_values(series + [over], kind="stable").reset_index(drop=True)
+    grouped = changes.groupby(series, observed=True, sort=False)
+    changes[f"previous_{over}"] = grouped[over].shift()
+    changes["previous_mean"] = grouped["mean"].shift()
+    changes["change"] = changes["mean"] - changes["previous_mean"]
+    columns = list(within) + [f"previous_{over}", over, "zone", "category", "previous_mean", "mean", "change"]
+    return changes.loc[changes[f"previous_{over}"].notna(), columns].reset_index(drop=True)
@@ -0,0 +1,204 @@
+import numpy as np
+import pandas as pd
+
+from workbook_loader import OPTIONAL_SHEETS, PIPELINE_COLUMNS
+from zones import RESERVED_ZONE_NAMES, ZONE_SHEET_COLUMNS, zone_names
+
+
+# Columns each sheet must have for the pipeline to run
+REQUIRED_COLUMNS = {sheet: columns for sheet, columns in PIPELINE_COLUMNS.items() if sheet not in OPTIONAL_SHEETS}
+
+# Positions along the transect in PositionalCharacteristics
+POSITION_COLUMNS = ["eastend", "toe_in", "toe_sea", "lowest_veg", "HTS"]
+
+ERROR_COLUMNS = ["sheet", "row", "check", "detail"]
+
+# Errors are listed in this sheet order; the optional Zones sheet comes last
+SHEET_ORDER = [*REQUIRED_COLUMNS, "Zones"]
+
+# Sheet rows are numbered like Excel: the header is row 1
+FIRST_DATA_ROW = 2
+
+
+class ValidationError(ValueError):
+    """Raised when an uploaded workbook fails validation; `errors` holds
+    the table returned by validate_sheets."""
+
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__(summarize(errors))
+
+    def __reduce__(self):
+        return type(self), (self.errors,)
+
+
+def summarize(errors, max_rows=5):
+    """One line per check: how many rows failed it and where."""
+    parts = []
+    for (sheet, check), group in errors.groupby(["sheet", "check"], sort=False):
+        rows = group["row"].dropna().astype(int).tolist()
+        if rows:
+            shown = ", ".join(str(row) for row in rows[:max_rows])
+            where = f" ({sheet} row{'s' if len(rows) > 1 else ''} {shown}{', ...' if len(rows) > max_rows else ''})"
+        else:
+            where = f" ({sheet}: {', '.join(group['detail'].astype(str))})"
+        parts.append(f"{len(group)} x {check}{where}")
+    return f"{len(errors)} validation error(s): " + "; ".join(parts)
+
+
+def _transect_key(df):
+    key = df["sitename"].astype(str) + "_" + df["date"].astype(str) + "_" + df["transect"].astype(str)
+    return key.where(df[["sitename", "date", "transect"]].notna().all(axis=1))
+
+
+def _errors(sheet, df, mask, check, detail):
+    """Error rows for the rows of df where mask is True. `detail` is a
+    string, a Series or a function building the messages from the flagged
+    index, so messages are only formatted for rows that fail."""
+    flagged = df.index[np.asarray(mask, dtype=bool)]
+    if callable(detail):
+        detail = detail(flagged)
+    if isinstance(detail, pd.Series):
+        detail = detail.loc[flagged].to_numpy()
+    return pd.DataFrame({
+        "sheet": sheet,
+        "row": flagged + FIRST_DATA_ROW,
+        "check": check,
+        "detail": detail,
+    })
+
+
+def _zone_errors(zones_df, transect_keys):
+    """Checks of the optional Zones sheet; transect_keys are the keys of
+    the transects in PositionalCharacteristics."""
+    zones = zones_df[zones_df[ZONE_SHEET_COLUMNS].notna().any(axis=1)]
+    key = _transect_key(zones)
+    names = zone_names(zones["zone"])
+    found = [
+        _errors("Zones", zones, key.isna(), "missing sitename/date/transect", "every zone interval needs all three"),
+        _errors("Zones", zones, key.notna() & ~key.isin(transect_keys), "transect not in PositionalCharacteristics", key),
+        _errors("Zones", zones, names.isna(), "missing zone", "zone name is blank"),
+        _errors(
+            "Zones", zones, names.isin(RESERVED_ZONE_NAMES), "reserved zone name",
+            lambda rows: "'" + names[rows].astype(str) + "' is used in the output column names",
+        ),
+    ]
+    for column in ["zone_start", "zone_end"]:
+        bound = pd.to_numeric(zones[column], errors="coerce")
+        found.append(_errors("Zones", zones, bound.isna(), f"missing {column}", f"{column} is blank or not a number"))
+    return found
+
+
+def validate_sheets(positional_df, transects_df, readme_df, zones_df=None):
+    """Check the uploaded sheets before any percent cover is computed.
+
+    Every check is a vectorized pass over the sheet, and all problems are
+    reported together as a DataFrame of (sheet, row, check, detail) in sheet
+    order; an empty table means the workbook is fine. Row numbers match the
+    Excel rows, given frames read with their default index as
+    workbook_loader.load_workbook_sheets (or pd.read_excel) returns them.
+    Completely blank rows are ignored, as the pipeline ignores them.
+
+    Checks:
+      - required columns are present
+      - PositionalCharacteristics: no transect listed twice, eastend,
+        toe_in, toe_sea, lowest_veg and HTS given as numbers
+      - ReadMe: no name listed twice
+      - Transects: the transect is in PositionalCharacteristics, type is given
+        and is a ReadMe name (or a "-D" dead plant code), cor_length is given
+        and not negative, start and end are numbers (if given), start <= end,
+        and the intercept overlaps the transect between eastend and HTS
+      - Zones (only checked when zones_df is given and has rows): the
+        transect is in PositionalCharacteristics, the zone has a name that
+        isn't reserved (zones.RESERVED_ZONE_NAMES), zone_start and zone_end
+        are given
+    """
+    sheets = {"PositionalCharacteristics": positional_df, "Transects": transects_df, "ReadMe": readme_df}
+    required = dict(REQUIRED_COLUMNS)
+    if zones_df is not None and not zones_df.empty:
+        sheets["Zones"] = zones_df
+        required["Zones"] = ZONE_SHEET_COLUMNS
+    found = []
+    for sheet, columns in required.items():
+        for column in columns:
+            if column not in sheets[sheet].columns:
+                found.append(pd.DataFrame({"sheet": [sheet], "row": [None], "check": ["missing column"], "detail": [column]}))
+    if found:
+        return pd.concat(found, ignore_index=True)
+
+    positional = positional_df[positional_df.notna().any(axis=1)]
+    transects = transects_df[transects_df[REQUIRED_COLUMNS["Transects"]].notna().any(axis=1)]
+
+    # PositionalCharacteristics
+    positional_key = _transect_key(positional)
+    found.append(_errors(
+        "PositionalCharacteristics", positional, positional_key.notna() & positional_key.duplicated(keep=False),
+        "duplicate transect", positional_key,
+    ))
+    for column in POSITION_COLUMNS:
+        value = pd.to_numeric(positional[column], errors="coerce")
+        found.append(_errors("PositionalCharacteristics", positional, positional[column].isna(), f"missing {column}", positional_key))
+        found.append(_errors(
+            "PositionalCharacteristics", positional, positional[column].notna() & value.isna(), f"{column} not a number",
+            lambda rows, column=column: positional_key[rows] + ": " + positional[column][rows].astype(str),
+        ))
+
+    # ReadMe
+    readme = readme_df[readme_df.notna().any(axis=1)]
+    names = readme["name"].astype("string").str.strip()
+    found.append(_errors(
+        "ReadMe", readme, names.notna() & names.duplicated(keep=False), "duplicate ReadMe name", names.astype(object),
+    ))
+
+    # Transects
+    key = _transect_key(transects)
+    extent = positional.assign(key=positional_key).dropna(subset=["key"]).drop_duplicates("key").set_index("key")
+    found.append(_errors("Transects", transects, key.isna(), "missing sitename/date/transect", "every intercept needs all three"))
+    orphan = key.notna() & ~key.isin(extent.index)
+    found.append(_errors("Transects", transects, orphan, "transect not in PositionalCharacteristics", key))
+
+    types = transects["type"].astype("string").str.strip()
+    found.append(_errors("Transects", transects, types.isna(), "missing type", "type is blank"))
+    known = types.isin(readme_df["name"].astype("string").str.strip()) | types.str.contains("-D", na=False)
+    found.append(_errors("Transects", transects, types.notna() & ~known, "type not in ReadMe", types.astype(object)))
+
+    cor_length = pd.to_numeric(transects["cor_length"], errors="coerce")
+    found.append(_errors("Transects", transects, cor_length.isna(), "missing cor_length", "cor_length is blank or not a number"))
+    found.append(_errors(
+        "Transects", transects, cor_length < 0, "negative cor_length",
+        lambda rows: "cor_length " + cor_length[rows].astype(str),
+    ))
+
+    start = pd.to_numeric(transects["start"], errors="coerce")
+    end = pd.to_numeric(transects["end"], errors="coerce")
+    for column, value in [("start", start), ("end", end)]:
+        found.append(_errors(
+            "Transects", transects, transects[column].notna() & value.isna(), f"{column} not a number",
+            lambda rows, column=column: f"{column} " + transects[column][rows].astype(str),
+        ))
+    found.append(_errors(
+        "Transects", transects, start > end, "start after end",
+        lambda rows: "start " + start[rows].astype(str) + " > end " + end[rows].astype(str),
+    ))
+
+    # An intercept entirely off its transect can't have been on it
+    eastend = key.map(pd.to_numeric(extent["eastend"], errors="coerce"))
+    hts = key.map(pd.to_numeric(extent["HTS"], errors="coerce"))
+    low = np.minimum(eastend, hts)
+    high = np.maximum(eastend, hts)
+    out_of_range = (np.maximum(start, end) < low) | (np.minimum(start, end) > high)
+    found.append(_errors(
+        "Transects", transects, out_of_range, "intercept outside transect",
+        lambda rows: start[rows].astype(str) + " to " + end[rows].astype(str) + " is not within "
+        + low[rows].astype(str) + " to " + high[rows].astype(str),
+    ))
+
+    if "Zones" in sheets:
+        found.extend(_zone_errors(zones_df, extent.index))
+
+    found = [frame for frame in found if not frame.empty]
+    if not found:
+        return pd.DataFrame(columns=ERROR_COLUMNS)
+    errors = pd.concat(found, ignore_index=True)
+    sheet_order = errors["sheet"].map({sheet: i for i, sheet in enumerate(SHEET_ORDER)})
+    return errors.iloc[np.lexsort((errors["row"], sheet_order))].reset_index(drop=True)
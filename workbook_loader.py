@@ -0,0 +1,94 @@
+import time
+from io import BytesIO
+
+import pandas as pd
+
+from zones import ZONE_SHEET_COLUMNS
+
+
+# Sheets and columns the percent cover pipeline reads from an uploaded workbook.
+# Everything else (Elevation, Metadata, SpeciesChecker, notes columns) is skipped.
+PIPELINE_COLUMNS = {
+    "PositionalCharacteristics": ["sitename", "date", "transect", "eastend", "toe_in", "toe_sea", "lowest_veg", "HTS"],
+    "Transects": ["sitename", "date", "transect", "start", "end", "type", "cor_length"],
+    "ReadMe": ["codetype", "name", "native"],
+    "Zones": ZONE_SHEET_COLUMNS,
+}
+
+# Sheets that may be left out of a workbook
+OPTIONAL_SHEETS = {"Zones"}
+
+# Repeated text columns of the large sheets are loaded as categoricals: each
+# distinct site, transect letter or species code is stored once and the rows
+# hold small integer codes
+CATEGORICAL_COLUMNS = {
+    "Transects": ["sitename", "transect", "type"],
+}
+
+
+def _read_sheet(worksheet, columns, categorical=()):
+    """Read the requested columns of one sheet into a DataFrame.
+
+    The first row is the header. Rows are kept up to the last one with any
+    value in it, so the thousands of formatted-but-empty rows in the template
+    sheets are never materialized. Blank rows in between are kept, like
+    pd.read_excel does. Columns listed in `categorical` become categoricals.
+    """
+    rows = worksheet.iter_rows(values_only=True)
+    header = next(rows, ())
+    positions = {}
+    for i, name in enumerate(header):
+        if name is not None and name not in positions:
+            positions[name] = i
+    wanted = [name for name in columns if name in positions]
+    indices = [positions[name] for name in wanted]
+
+    records = []
+    pending_blank = 0
+    for row in rows:
+        if all(value is None for value in row):
+            pending_blank += 1
+            continue
+        if pending_blank:
+            records.extend([(None,) * len(indices)] * pending_blank)
+            pending_blank = 0
+        records.append(tuple(row[i] if i < len(row) else None for i in indices))
+
+    df = pd.DataFrame.from_records(records, columns=wanted)
+    for name in categorical:
+        if name in df.columns:
+            df[name] = df[name].astype("category")
+    return df
+
+
+def load_workbook_sheets(source, columns=PIPELINE_COLUMNS):
+    """Open a workbook once and read only the sheets/columns the pipeline needs.
+
+    `source` is a path, a file-like object or the raw bytes of an .xlsx file.
+    `columns` maps sheet name -> list of column names to keep; requested
+    columns missing from a sheet are left out, as are OPTIONAL_SHEETS the
+    workbook doesn't have. Returns (sheets, timings) where timings maps each
+    sheet (and "open") to its parse time in seconds.
+    """
+    import openpyxl  # only needed once a workbook is uploaded
+
+    if isinstance(source, (bytes, bytearray)):
+        source = BytesIO(source)
+
+    timings = {}
+    started = time.perf_counter()
+    workbook = openpyxl.load_workbook(source, read_only=True, data_only=True)
+    timings["open"] = time.perf_counter() - started
+
+    sheets = {}
+    try:
+        for sheet_name, sheet_columns in columns.items():
+            if sheet_name in OPTIONAL_SHEETS and sheet_name not in workbook.sheetnames:
+                continue
+            started = time.perf_counter()
+            sheets[sheet_name] = _read_sheet(workbook[sheet_name], sheet_columns, CATEGORICAL_COLUMNS.get(sheet_name, ()))
+            timings[sheet_name] = time.perf_counter() - started
+    finally:
+        workbook.close()
+
+    return sheets, timings
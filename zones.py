@@ -0,0 +1,178 @@
+import numpy as np
+import pandas as pd
+
+
+# Length column in calculations_df for the built-in zones; any other zone
+# gets "<zone>_length"
+BUILTIN_LENGTH_COLUMNS = {
+    "whole": "tran_length",
+    "dune": "dune_length",
+    "veg": "veg_length",
+}
+
+# Columns of the optional "Zones" sheet for user-defined zones
+ZONE_SHEET_COLUMNS = ["sitename", "date", "transect", "zone", "zone_start", "zone_end"]
+
+# Output columns are pctcov_<category>_<zone>, with pctcov_all_<zone> for all
+# cover and a "_transect" suffix for codetypes over the whole transect, so a
+# zone can't be called "all" or "transect"
+RESERVED_ZONE_NAMES = ("all", "transect")
+
+
+def zone_names(names):
+    """Zone names as used in column names: spaces and underscores are
+    removed ("back dune" and "back_dune" are both "backdune"), so the zone
+    is always the text after the last underscore of a pctcov column. Blank
+    names become NA."""
+    names = names.astype("string").str.replace(r"[\s_]+", "", regex=True)
+    return names.mask(names == "")
+
+
+def zone_length_column(zone):
+    return BUILTIN_LENGTH_COLUMNS.get(zone, f"{zone}_length")
+
+
+def default_zones(positional_df):
+    """The whole/dune/veg intervals of every transect as a long table of
+    (transect_id, zone, zone_start, zone_end).
+
+    whole runs from eastend to HTS, dune between the two toes and veg from
+    eastend to lowest_veg. positional_df must already carry its transect_id
+    (see transect_processing.prepare_transects).
+    """
+    bounds = {
+        "whole": ("eastend", "HTS"),
+        "dune": ("toe_in", "toe_sea"),
+        "veg": ("eastend", "lowest_veg"),
+    }
+    frames = []
+    for zone, (a, b) in bounds.items():
+        frames.append(pd.DataFrame({
+            "transect_id": positional_df["transect_id"],
+            "zone": zone,
+            "zone_start": np.minimum(positional_df[a], positional_df[b]),
+            "zone_end": np.maximum(positional_df[a], positional_df[b]),
+        }))
+    return pd.concat(frames, ignore_index=True)
+
+
+def user_zones(zones_sheet, transect_ids):
+    """User-defined zones from the "Zones" sheet.
+
+    Each row is one interval; a zone can be made of several intervals on the
+    same transect, and overlapping ones are merged (merge_overlaps) so the
+    overlap isn't counted twice. transect_ids gives
+    the transect_id of each sheet row (transect_processing.transect_ids);
+    rows on unknown transects or without a zone name are dropped. Zone
+    names are normalized by zone_names; a ValueError is raised for names in
+    RESERVED_ZONE_NAMES.
+    """
+    names = zone_names(zones_sheet["zone"])
+    reserved = sorted(set(names[names.isin(RESERVED_ZONE_NAMES)]))
+    if reserved:
+        raise ValueError(f"Reserved zone name(s) {', '.join(map(repr, reserved))} can't be used; rename them in the Zones sheet")
+    zones = pd.DataFrame({
+        "transect_id": transect_ids,
+        "zone": names.astype(object),
+        "zone_start": np.minimum(zones_sheet["zone_start"], zones_sheet["zone_end"]),
+        "zone_end": np.maximum(zones_sheet["zone_start"], zones_sheet["zone_end"]),
+    }, index=zones_sheet.index)
+    return merge_overlaps(zones[zones["transect_id"] >= 0].dropna(subset=["zone"]))
+
+
+def merge_overlaps(zones):
+    """Merge the overlapping (or touching) intervals of each zone on a
+    transect into one, so [0, 4] and [2, 6] become [0, 6]. Zones keep the
+    order they first appear in."""
+    zone_codes = pd.factorize(zones["zone"])[0]
+    zones = zones.iloc[np.lexsort((zones["zone_start"].to_numpy(), zones["transect_id"].to_numpy(), zone_codes))]
+    group = [zones["transect_id"], zones["zone"]]
+    # An interval starts a new run unless it begins before the furthest end so far
+    reach = zones["zone_end"].groupby(group).cummax().groupby(group).shift()
+    run = (reach.isna() | (zones["zone_start"] > reach)).cumsum()
+    return zones.groupby(run.to_numpy(), sort=False).agg(
+        transect_id=("transect_id", "first"),
+        zone=("zone", "first"),
+        zone_start=("zone_start", "first"),
+        zone_end=("zone_end", "max"),
+    ).reset_index(drop=True)
+
+
+def combine_zones(defaults, extra):
+    """Add user zones to the defaults. A user zone with a built-in name
+    replaces that built-in zone on the transects it is defined for."""
+    if extra is None or extra.empty:
+        return defaults
+    overridden = pd.MultiIndex.from_frame(extra[["transect_id", "zone"]])
+    keep = ~pd.MultiIndex.from_frame(defaults[["transect_id", "zone"]]).isin(overridden)
+    return pd.concat([defaults[keep], extra], ignore_index=True)
+
+
+def apportion(transects_df, zones):
+    """Clip every intercept to every zone of its transect and apportion its
+    cor_length by the fraction of [start, end] that falls inside the zone.
+
+    Returns a DataFrame aligned to transects_df with one column per zone
+    name, in the order the zones first appear. Zero-length intercepts count
+    fully in the zones containing their point. Intercepts with no position or
+    on a transect without that zone get 0; a missing cor_length stays NaN so
+    it is skipped when summed.
+    Everything is done on flat NumPy arrays of (intercept, zone interval)
+    pairs, so cost is linear in intercepts x zones per transect.
+    """
+    zone_codes, zone_names = pd.factorize(zones["zone"])
+    n_rows = len(transects_df)
+    n_zones = len(zone_names)
+
+    # Both tables are keyed by transect_id; -1 (no transect) never matches
+    row_key = transects_df["transect_id"].to_numpy(dtype=np.int64)
+    zone_key = zones["transect_id"].to_numpy(dtype=np.int64)
+    n_keys = max(row_key.max(initial=-1), zone_key.max(initial=-1)) + 1
+    keep = zone_key >= 0
+    order = np.argsort(zone_key[keep], kind="stable")
+    zone_key = zone_key[keep][order]
+    zone_codes = zone_codes[keep][order]
+    zone_start = zones["zone_start"].to_numpy(dtype=float)[keep][order]
+    zone_end = zones["zone_end"].to_numpy(dtype=float)[keep][order]
+
+    # Zones are now grouped by transect: counts[k] intervals starting at offsets[k]
+    counts = np.bincount(zone_key, minlength=n_keys)
+    offsets = np.cumsum(counts) - counts
+    has_key = row_key >= 0
+    per_row = np.zeros(n_rows, dtype=np.int64)
+    per_row[has_key] = counts[row_key[has_key]]
+    row_offset = np.zeros(n_rows, dtype=np.int64)
+    row_offset[has_key] = offsets[row_key[has_key]]
+
+    # Expand to one entry per (intercept, zone interval on its transect)
+    pair_row = np.repeat(np.arange(n_rows), per_row)
+    pair_zone = np.repeat(row_offset - (np.cumsum(per_row) - per_row), per_row) + np.arange(len(pair_row))
+
+    start = transects_df["start"].to_numpy(dtype=float)
+    end = transects_df["end"].to_numpy(dtype=float)
+    lo = np.minimum(start, end)[pair_row]
+    hi = np.maximum(start, end)[pair_row]
+    z_lo = zone_start[pair_zone]
+    z_hi = zone_end[pair_zone]
+
+    span = hi - lo
+    overlap = np.clip(np.minimum(hi, z_hi) - np.maximum(lo, z_lo), 0, None)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        fraction = np.where(span > 0, overlap / span, (lo >= z_lo) & (lo <= z_hi))
+    fraction = np.nan_to_num(fraction, nan=0.0)
+
+    cor_length = transects_df["cor_length"].to_numpy(dtype=float)
+    weights = cor_length[pair_row] * fraction
+    flat = pair_row * n_zones + zone_codes[pair_zone]
+    apportioned = np.bincount(flat, weights=weights, minlength=n_rows * n_zones).reshape(n_rows, n_zones)
+    # Missing cor_length stays missing rather than turning into 0
+    apportioned[np.isnan(cor_length)] = np.nan
+
+    return pd.DataFrame(apportioned, index=transects_df.index, columns=list(zone_names))
+
+
+def zone_lengths(zones, transects):
+    """Total length of each zone on each transect, as a DataFrame aligned to
+    the `transects` ids with one column per zone."""
+    lengths = (zones["zone_end"] - zones["zone_start"]).groupby([zones["transect_id"], zones["zone"]]).sum(min_count=1)
+    return lengths.unstack("zone").reindex(index=pd.Index(transects))